@@ -9,5 +9,8 @@ const proxySearchService = buildProxy(process.env.PYTHON_COOK_SERVICE_URL);
 
 router.post("/", proxySearchService);
 router.post("/search-by-keyword", proxySearchService);
+router.post("/batch", proxySearchService);
+router.post("/search-by-keyword/batch", proxySearchService);
+router.get("/suggest", proxySearchService);
 
 module.exports = router;
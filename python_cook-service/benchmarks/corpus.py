@@ -0,0 +1,126 @@
+# benchmarks/corpus.py
+"""
+Sinh corpus công thức món Việt giả lập (deterministic theo seed) đúng shape mà
+build_cache / generate_text_and_meta đọc: recipes + ingredients / tags / cuisines / categories.
+"""
+import random
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+BASE_DISHES = [
+    "Phở bò", "Phở gà", "Bún chả", "Bún bò Huế", "Bún riêu", "Bún thịt nướng", "Cơm tấm",
+    "Cơm gà", "Cháo gà", "Cháo lòng", "Bánh xèo", "Bánh cuốn", "Bánh mì", "Gỏi cuốn",
+    "Chả giò", "Bò kho", "Cá kho tộ", "Thịt kho trứng", "Canh chua cá", "Lẩu thái",
+    "Lẩu mắm", "Gà nướng", "Sườn nướng", "Mì quảng", "Hủ tiếu", "Bò lúc lắc", "Rau muống xào tỏi",
+    "Đậu hũ sốt cà", "Nem nướng", "Xôi gà",
+]
+STYLES = ["", "đặc biệt", "truyền thống", "kiểu Huế", "miền Tây", "Hà Nội", "chay", "cay", "nhà làm", "thập cẩm"]
+INGREDIENTS = [
+    "Thịt bò", "Thịt gà", "Thịt heo", "Sườn heo", "Tôm", "Cá lóc", "Mực", "Trứng gà", "Đậu hũ",
+    "Bánh phở", "Bún", "Gạo", "Gạo nếp", "Mì", "Bánh tráng", "Hành lá", "Hành tím", "Tỏi", "Gừng",
+    "Sả", "Ớt", "Chanh", "Rau muống", "Giá đỗ", "Cà chua", "Dứa", "Nấm rơm", "Rau thơm",
+    "Nước mắm", "Mắm tôm", "Đường", "Muối", "Tiêu", "Dầu ăn", "Nước dừa", "Quế", "Hoa hồi",
+]
+TAGS = ["Món chính", "Ăn sáng", "Ăn vặt", "Healthy", "Món chay", "Món nước", "Nhanh gọn", "Đãi tiệc", "Cay"]
+CUISINES = ["Việt Nam", "Thái", "Hàn Quốc", "Nhật Bản", "Trung Hoa"]
+CATEGORIES = ["Món nước", "Món khô", "Món nướng", "Món xào", "Món canh", "Tráng miệng"]
+DIFFICULTIES = ["Dễ", "Trung bình", "Khó"]
+
+# Truy vấn mẫu cho benchmark search (giống người dùng thật)
+KEYWORD_QUERIES = [
+    "phở bò", "bun bo hue", "cơm tấm", "cháo", "bánh xèo", "lẩu", "gà nướng", "chay", "bò kho",
+    "canh chua", "mì quảng", "hủ tiếu", "bánh mì", "nem", "xôi", "sườn", "tôm", "cá kho", "rau muống", "cay",
+]
+
+
+def named_docs(names):
+    return [{"_id": ObjectId(), "name": n, "nameLowercase": n.lower()} for n in names]
+
+
+def make_recipe(rnd, i, lookups, updated_at):
+    ings, tags, cuisines, categories = lookups
+    dish, style = rnd.choice(BASE_DISHES), rnd.choice(STYLES)
+    name = " ".join(p for p in (dish, style, f"#{i}") if p)
+    picked = rnd.sample(ings, rnd.randint(3, 12))
+    return {
+        "_id": ObjectId(),
+        "name": name,
+        "nameLowercase": name.lower(),
+        "short": f"{dish} {style} với {', '.join(x['name'].lower() for x in picked[:3])}".strip(),
+        "ingredients": [x["_id"] for x in picked],
+        "tags": [x["_id"] for x in rnd.sample(tags, rnd.randint(1, 3))],
+        "instructions": [
+            {"title": f"Bước {s + 1}", "images": [], "subTitle": [f"Sơ chế và nấu {dish.lower()}"]}
+            for s in range(rnd.randint(2, 6))
+        ],
+        "image": f"https://example.com/recipes/{i}.jpg",
+        "video": "",
+        "calories": rnd.randint(150, 900),
+        "time": rnd.choice([15, 20, 30, 45, 60, 90]),
+        "size": rnd.randint(1, 6),
+        "difficulty": rnd.choice(DIFFICULTIES),
+        "cuisine": rnd.choice(cuisines)["_id"],
+        "category": rnd.choice(categories)["_id"],
+        "rate": round(rnd.uniform(0, 5), 1),
+        "numberOfRate": rnd.randint(0, 500),
+        "createdAt": updated_at,
+        "updatedAt": updated_at,
+    }
+
+
+def seed_corpus(db, n_recipes, seed=42, batch_size=5000):
+    """Ghi corpus vào database `db` (pymongo / mongomock); trả về danh sách ingredient (cho query mẫu)"""
+    rnd = random.Random(seed)
+    lookups = tuple(named_docs(names) for names in (INGREDIENTS, TAGS, CUISINES, CATEGORIES))
+    for col, docs in zip(("ingredients", "tags", "cuisines", "categories"), lookups):
+        db[col].delete_many({})
+        db[col].insert_many(docs)
+
+    db["recipes"].delete_many({})
+    start = datetime(2025, 1, 1)
+    batch = []
+    for i in range(n_recipes):
+        batch.append(make_recipe(rnd, i, lookups, start + timedelta(seconds=i)))
+        if len(batch) >= batch_size:
+            db["recipes"].insert_many(batch)
+            batch = []
+    if batch:
+        db["recipes"].insert_many(batch)
+    return [x["name"] for x in lookups[0]]
+
+
+def touch_recipes(db, fraction, seed=7):
+    """Sửa `fraction` số recipe (đổi short + updatedAt) để đo delta sync; trả về số bản ghi đã sửa"""
+    rnd = random.Random(seed)
+    ids = [r["_id"] for r in db["recipes"].find({}, {"_id": 1})]
+    picked = rnd.sample(ids, max(1, int(len(ids) * fraction)))
+    now = datetime(2026, 1, 1)
+    for n, oid in enumerate(picked):
+        db["recipes"].update_one(
+            {"_id": oid},
+            {"$set": {"short": f"Công thức cập nhật lần {n}", "updatedAt": now + timedelta(seconds=n)}},
+        )
+    return len(picked)
+
+
+def search_requests(ingredient_names, n, seed=11):
+    """n payload cho /search và n payload cho search-by-keyword"""
+    rnd = random.Random(seed)
+    search = [
+        {
+            "ingredients": rnd.sample(ingredient_names, rnd.randint(1, 4)),
+            "tags": rnd.sample(TAGS, 1) if rnd.random() < 0.3 else [],
+            "cuisine": rnd.choice(CUISINES) if rnd.random() < 0.2 else None,
+            "top_k": 20,
+        }
+        for _ in range(n)
+    ]
+    keyword = [
+        {
+            "keywords": rnd.choice(KEYWORD_QUERIES),
+            "category": rnd.choice(CATEGORIES) if rnd.random() < 0.2 else None,
+            "top_k": 20,
+        }
+        for _ in range(n)
+    ]
+    return search, keyword
@@ -0,0 +1,218 @@
+# benchmarks/run.py
+"""
+Benchmark offline cho search và sync.
+
+    python -m benchmarks.run                                  # 1k, 10k, 100k recipes
+    python -m benchmarks.run --sizes 1000 --queries 300 --output bench.json
+    python -m benchmarks.run --mongo-uri mongodb://localhost:27017/   # mongod thật thay cho mongomock
+    python -m benchmarks.run --encoder hash                   # bỏ qua chi phí model, chỉ đo phần còn lại
+
+Mỗi kích thước corpus chạy trong 1 process riêng (Chroma tạm, Mongo sạch, index in-memory rỗng).
+Kết quả JSON kèm commit hiện tại để so sánh giữa các commit.
+Mặc định tắt cache kết quả search (SEARCH_RESULT_CACHE_SIZE=0) để đo đường tính toán thật.
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+RESULT_MARKER = "BENCH_RESULT "
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class HashEncoder:
+    """Encoder giả lập (hashing trick, 384 chiều): tách chi phí model khỏi phần còn lại của service"""
+
+    dim = 384
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, **kwargs):
+        single = isinstance(texts, str)
+        out = np.zeros((1 if single else len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate([texts] if single else texts):
+            for word in text.lower().split():
+                out[row, int(hashlib.md5(word.encode("utf-8")).hexdigest()[:8], 16) % self.dim] += 1.0
+        out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out[0] if single else out
+
+
+def percentiles(latencies_ms):
+    arr = np.asarray(latencies_ms)
+    return {
+        "p50_ms": round(float(np.percentile(arr, 50)), 2),
+        "p95_ms": round(float(np.percentile(arr, 95)), 2),
+        "p99_ms": round(float(np.percentile(arr, 99)), 2),
+    }
+
+
+async def bench_endpoint(client, url, payloads, concurrency, warmup=10):
+    """Latency từng request + QPS khi chạy `concurrency` request đồng thời"""
+    for body in payloads[:warmup]:
+        (await client.post(url, json=body)).raise_for_status()
+
+    latencies, sem = [], asyncio.Semaphore(concurrency)
+
+    async def one(body):
+        async with sem:
+            start = time.perf_counter()
+            resp = await client.post(url, json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            resp.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(body) for body in payloads))
+    elapsed = time.perf_counter() - start
+    return {"requests": len(payloads), "qps": round(len(payloads) / elapsed, 1), **percentiles(latencies)}
+
+
+def timed_sync(sync, **kwargs):
+    start = time.perf_counter()
+    sync(**kwargs)
+    return time.perf_counter() - start
+
+
+def run_worker(args):
+    """Đo 1 kích thước corpus trong process hiện tại, in kết quả JSON (dòng RESULT_MARKER)"""
+    workdir = tempfile.mkdtemp(prefix="cook-bench-")
+    os.environ["CHROMA_PATH"] = os.path.join(workdir, "chroma")
+    os.environ["DB_NAME"] = "cook_bench"
+    os.environ.setdefault("SEARCH_RESULT_CACHE_SIZE", "0")
+    if args.mongo_uri:
+        os.environ["MONGODB_URI"] = args.mongo_uri
+    else:
+        import mongomock
+        import pymongo
+
+        os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+        shared = mongomock.MongoClient()
+        pymongo.MongoClient = lambda *a, **k: shared
+
+    sys.path.insert(0, SERVICE_DIR)
+    from benchmarks.corpus import seed_corpus, touch_recipes, search_requests
+    from config.settings import settings
+    from data import db as data_db
+
+    if args.encoder == "hash":
+        data_db.load_encoder = HashEncoder
+
+    import httpx
+    import main
+    from data.indexing import sync_recipes_to_chroma
+    from data.popularity import popularity_store
+    from services.startup import readiness, warm_up_model
+
+    result = {"recipes": args.size, "encoder": args.encoder if args.encoder == "hash" else data_db.EMBED_MODEL_KEY}
+    quiet = open(os.devnull, "w")
+    try:
+        with contextlib.redirect_stdout(quiet):
+            mongo_db = data_db.mongo_client[settings.DB_NAME]
+            start = time.perf_counter()
+            ingredient_names = seed_corpus(mongo_db, args.size)
+            result["seed_seconds"] = round(time.perf_counter() - start, 2)
+
+            warm_up_model()
+            popularity_store.refresh()
+
+            # Full sync từ Chroma rỗng (encode toàn bộ) → full reconcile không có thay đổi
+            elapsed = timed_sync(sync_recipes_to_chroma, full=True)
+            result["full_sync"] = {"seconds": round(elapsed, 2), "recipes_per_s": round(args.size / elapsed, 1)}
+            elapsed = timed_sync(sync_recipes_to_chroma, full=True)
+            result["full_sync_noop"] = {"seconds": round(elapsed, 2), "recipes_per_s": round(args.size / elapsed, 1)}
+
+            # Delta sync sau khi sửa 1 phần corpus → delta không có thay đổi
+            changed = touch_recipes(mongo_db, args.delta_fraction)
+            elapsed = timed_sync(sync_recipes_to_chroma)
+            result["delta_sync"] = {"changed": changed, "seconds": round(elapsed, 3), "recipes_per_s": round(changed / elapsed, 1)}
+            result["delta_sync_noop"] = {"seconds": round(timed_sync(sync_recipes_to_chroma), 3)}
+            readiness.mark(index_loaded=True)
+
+            search_payloads, keyword_payloads = search_requests(ingredient_names, args.queries)
+
+            async def bench_search():
+                transport = httpx.ASGITransport(app=main.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                    return {
+                        "search": await bench_endpoint(client, "/api/search", search_payloads, args.concurrency),
+                        "search_by_keyword": await bench_endpoint(
+                            client, "/api/search/search-by-keyword", keyword_payloads, args.concurrency
+                        ),
+                    }
+
+            result.update(asyncio.run(bench_search()))
+    finally:
+        quiet.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(RESULT_MARKER + json.dumps(result))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=SERVICE_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results):
+    print(f"{'recipes':>8} | {'full sync/s':>11} | {'delta sync':>14} | {'endpoint':<18} | {'p50 ms':>7} | {'p95 ms':>7} | {'p99 ms':>7} | {'QPS':>7}")
+    for r in results:
+        for endpoint in ("search", "search_by_keyword"):
+            e = r[endpoint]
+            print(
+                f"{r['recipes']:>8} | {r['full_sync']['recipes_per_s']:>11} | "
+                f"{r['delta_sync']['changed']:>6} in {r['delta_sync']['seconds']:>5}s | {endpoint:<18} | "
+                f"{e['p50_ms']:>7} | {e['p95_ms']:>7} | {e['p99_ms']:>7} | {e['qps']:>7}"
+            )
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark search + sync của python_cook-service")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--queries", type=int, default=200, help="số request đo cho mỗi endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--delta-fraction", type=float, default=0.01, help="tỉ lệ recipe bị sửa trước delta sync")
+    parser.add_argument("--encoder", choices=("model", "hash"), default="model")
+    parser.add_argument("--mongo-uri", default=None, help="mongod thật (mặc định: mongomock in-process)")
+    parser.add_argument("--output", default=None, help="ghi kết quả JSON ra file")
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    results = []
+    for size in args.sizes:
+        cmd = [
+            sys.executable, "-m", "benchmarks.run", "--worker", "--size", str(size),
+            "--queries", str(args.queries), "--concurrency", str(args.concurrency),
+            "--delta-fraction", str(args.delta_fraction), "--encoder", args.encoder,
+        ]
+        if args.mongo_uri:
+            cmd += ["--mongo-uri", args.mongo_uri]
+        print(f"[Bench] {size} recipes ...", flush=True)
+        proc = subprocess.run(cmd, cwd=SERVICE_DIR, capture_output=True, text=True)
+        lines = [l for l in proc.stdout.splitlines() if l.startswith(RESULT_MARKER)]
+        if proc.returncode != 0 or not lines:
+            print(proc.stderr[-2000:], file=sys.stderr)
+            sys.exit(f"[Bench] ❌ Run with {size} recipes failed")
+        results.append(json.loads(lines[-1][len(RESULT_MARKER):]))
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"commit": git_commit(), "concurrency": args.concurrency, "results": results}, f, indent=2)
+        print(f"[Bench] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,23 @@
+# config/logger.py
+import logging
+import random
+from config.settings import settings
+
+
+def setup_logging():
+    logging.basicConfig(
+        level=settings.LOG_LEVEL.upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    # Log "Added job ..." / "Running job ..." của scheduler mỗi chu kỳ sync là nhiễu
+    logging.getLogger("apscheduler").setLevel(logging.WARNING)
+
+
+def get_logger(name):
+    return logging.getLogger(f"cook.{name}")
+
+
+def debug_sampled(logger, msg, *args):
+    """Log DEBUG theo request chỉ cho 1 phần request (LOG_SAMPLE_RATE) để không nghẽn stdout khi tải cao"""
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < settings.LOG_SAMPLE_RATE:
+        logger.debug(msg, *args)
@@ -6,6 +6,81 @@ class Settings(BaseSettings):
     COLLECTION_NAME: str = "recipes"
     CHROMA_PATH: str = "./chroma_db"
 
+    # Lịch sync Mongo → Chroma: delta theo watermark + full reconcile định kỳ
+    SYNC_INTERVAL_SECONDS: int = 60
+    FULL_SYNC_INTERVAL_HOURS: int = 24
+    # Delta sync đọc lại từ (watermark - lag): bản ghi có updatedAt cũ hơn watermark nhưng commit sau lần đọc trước
+    # (clock lệch giữa các app server, transaction chậm) không bị bỏ sót; đọc lại bản ghi không đổi thì manifest bỏ qua
+    SYNC_WATERMARK_LAG_SECONDS: int = 30
+
+    # Pipeline index: số recipe mỗi chunk, số chunk tối đa chờ giữa các stage, chu kỳ log tiến độ
+    SYNC_BATCH_SIZE: int = 256
+    SYNC_PIPELINE_QUEUE_SIZE: int = 2
+    SYNC_PROGRESS_SECONDS: int = 5
+
+    # Chu kỳ refresh side store rate / numberOfRate từ Mongo
+    POPULARITY_REFRESH_SECONDS: int = 15
+
+    # Số bản ghi mỗi trang khi duyệt metadata Chroma
+    CHROMA_PAGE_SIZE: int = 1000
+
+    # Embedding model
+    EMBED_MODEL_NAME: str = "all-MiniLM-L6-v2"
+    EMBED_BACKEND: str = "torch"  # torch | onnx | onnx-int8
+    EMBED_ONNX_INT8_FILE: str = "onnx/model_quint8_avx2.onnx"
+
+    # Cache embedding của query (LRU + TTL)
+    QUERY_EMBED_CACHE_SIZE: int = 2048
+    QUERY_EMBED_CACHE_TTL: int = 3600  # giây
+
+    # Cache response search theo request + generation của index (LRU + TTL)
+    SEARCH_RESULT_CACHE_SIZE: int = 1024
+    SEARCH_RESULT_CACHE_TTL: int = 60  # giây
+
+    # Cursor pagination: số hit được rank 1 lần cho cả chuỗi trang, snapshot giữ trong cache (LRU + TTL)
+    PAGINATION_POOL_SIZE: int = 300
+    PAGINATION_MAX_PAGE_SIZE: int = 100
+    PAGINATION_SNAPSHOT_CACHE_SIZE: int = 256
+    PAGINATION_SNAPSHOT_TTL: int = 600  # giây
+
+    # Số request tối đa trong 1 lần gọi batch search
+    BATCH_SEARCH_MAX_ITEMS: int = 50
+
+    # Cache gợi ý autocomplete theo prefix (prefix ngắn như "p", "ph" lặp lại liên tục)
+    SUGGEST_CACHE_SIZE: int = 4096
+    SUGGEST_CACHE_TTL: int = 15  # giây
+
+    # Micro-batching encode query: tối đa N query / batch, chờ tối đa X ms để gom
+    EMBED_BATCH_MAX_SIZE: int = 32
+    EMBED_BATCH_MAX_WAIT_MS: int = 5
+
+    # Số ứng viên lấy từ inverted index BM25 cho search-by-keyword
+    KEYWORD_CANDIDATES: int = 100
+
+    # Số món khớp nguyên liệu tốt nhất (từ posting index) gộp vào /search
+    INGREDIENT_CANDIDATES: int = 100
+
+    # Nhiều worker (uvicorn --workers N): chỉ 1 process giữ file lock làm leader (sync + ghi Chroma),
+    # các worker còn lại poll generation và reload index. Tắt → mọi process đều tự sync như trước
+    SYNC_LEADER_LOCK: bool = True
+    FOLLOWER_POLL_SECONDS: int = 5
+    # Follower chỉ patch các id leader vừa đổi; quá số id này thì build lại toàn bộ index in-memory
+    FOLLOWER_PATCH_MAX_IDS: int = 5000
+
+    # Nén gzip response: chỉ nén body >= GZIP_MINIMUM_SIZE byte (0 = tắt), level thấp để đỡ tốn CPU
+    GZIP_MINIMUM_SIZE: int = 1024
+    GZIP_COMPRESS_LEVEL: int = 5
+
+    # Snapshot index (embeddings .npy + metadata + manifest) trên volume dùng chung: replica mới nạp snapshot
+    # rồi chỉ sync delta thay vì encode lại toàn bộ. Rỗng = tắt; SNAPSHOT_EXPORT_HOURS = 0 → chỉ export thủ công
+    SNAPSHOT_DIR: str = ""
+    SNAPSHOT_KEEP: int = 2
+    SNAPSHOT_EXPORT_HOURS: int = 0
+
+    # Logging: level chung + tỉ lệ request được log DEBUG (log theo request được lấy mẫu)
+    LOG_LEVEL: str = "INFO"
+    LOG_SAMPLE_RATE: float = 0.01
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 settings = Settings()
@@ -0,0 +1,114 @@
+# data/cache.py
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Chuẩn hóa chuỗi làm key cache: NFC, lowercase, gộp khoảng trắng"""
+    text = unicodedata.normalize("NFC", text or "")
+    return " ".join(text.lower().split())
+
+
+class TTLCache:
+    """
+    Cache LRU có giới hạn kích thước + thời gian sống (TTL), an toàn đa luồng.
+    Đếm hit/miss để theo dõi hiệu quả cache.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class QueryEmbeddingCache(TTLCache):
+    """Cache embedding của query, gắn với model đang dùng (đổi model → xóa cache)"""
+
+    def __init__(self, maxsize, ttl, model_key=None):
+        super().__init__(maxsize, ttl)
+        self.model_key = model_key
+
+    def bind_model(self, model_key):
+        """Gọi mỗi khi load model; nếu model khác model cũ thì xóa toàn bộ cache"""
+        if model_key != self.model_key:
+            self.clear()
+            self.model_key = model_key
+
+    def stats(self):
+        return {**super().stats(), "model": self.model_key}
+
+
+class SearchResultCache(TTLCache):
+    """
+    Cache response của search theo request đã chuẩn hóa + generation của index và version của popularity.
+    Sync thêm / sửa / xóa dữ liệu → generation tăng, rating đổi (refresh / push) → version tăng → kết quả cũ bị bỏ.
+    """
+
+    def __init__(self, maxsize, ttl):
+        super().__init__(maxsize, ttl)
+        self.generation = None
+
+    def bind_generation(self, generation):
+        if generation != self.generation:
+            self.clear()
+            self.generation = generation
+
+    @staticmethod
+    def request_key(kind, req, generation):
+        """Key từ payload: chuẩn hóa chuỗi (model uncased, filter so sánh lowercase), giữ thứ tự list"""
+        fields = []
+        for name, value in sorted(req.model_dump().items()):
+            if isinstance(value, str):
+                value = normalize_text(value)
+            elif isinstance(value, list):
+                value = tuple(normalize_text(v) for v in value if v.strip())
+            fields.append((name, value))
+        return (kind, generation, tuple(fields))
+
+    def stats(self):
+        return {**super().stats(), "generation": self.generation}
@@ -1,11 +1,18 @@
 from pymongo import MongoClient
 import chromadb
-from sentence_transformers import SentenceTransformer
+import numpy as np
+import threading
 from fastapi import HTTPException
 from config.settings import settings
+from config.logger import get_logger
 from bson import json_util
+from data.cache import QueryEmbeddingCache, normalize_text
+from data.embed_batcher import EmbeddingBatcher
+from data.encoder import load_encoder, encoder_key
 
-# Kết nối MongoDB
+logger = get_logger("db")
+
+# Kết nối MongoDB (MongoClient kết nối lười ở background, không chặn lúc import)
 mongo_client = MongoClient(settings.MONGODB_URI)
 db = mongo_client[settings.DB_NAME]
 mongo_collection = db[settings.COLLECTION_NAME]
@@ -17,22 +24,140 @@ cuisines_col = db["cuisines"]
 categories_col = db["categories"]
 
 # Kết nối ChromaDB
-client = chromadb.PersistentClient(path=settings.CHROMA_PATH)
-collection = client.get_or_create_collection(name=settings.COLLECTION_NAME)
+class ChromaCollection:
+    """
+    Giữ collection Chroma hiện tại của process.
+    reload() mở lại client để worker follower thấy dữ liệu do leader (process khác) vừa ghi.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._collection = None
+        self.reload()
+
+    def reload(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.clear_system_cache()
+            self._client = chromadb.PersistentClient(path=settings.CHROMA_PATH)
+            self._collection = self._client.get_or_create_collection(name=settings.COLLECTION_NAME)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+collection = ChromaCollection()
+
+# Embedding model (backend torch / onnx / onnx-int8 theo EMBED_BACKEND)
+# Load lười: lần đầu dùng hoặc trong warmup nền lúc startup → app nhận request ngay
+EMBED_MODEL_KEY = encoder_key()
+_embed_model = None
+_embed_model_lock = threading.Lock()
+
+def get_embed_model():
+    global _embed_model
+    if _embed_model is None:
+        with _embed_model_lock:
+            if _embed_model is None:
+                _embed_model = load_encoder()
+    return _embed_model
+
+# Cache embedding của query: các từ khóa phổ biến ("phở bò", ...) lặp lại liên tục
+query_embedding_cache = QueryEmbeddingCache(
+    maxsize=settings.QUERY_EMBED_CACHE_SIZE,
+    ttl=settings.QUERY_EMBED_CACHE_TTL,
+)
+query_embedding_cache.bind_model(EMBED_MODEL_KEY)
 
-# Embedding model
-embed_model = SentenceTransformer("all-MiniLM-L6-v2")
+# Gom các query đồng thời thành 1 batch encode (1 forward pass thay vì nhiều pass nhỏ)
+embed_batcher = EmbeddingBatcher(
+    lambda texts: get_embed_model().encode(texts, batch_size=len(texts), show_progress_bar=False),
+    max_batch_size=settings.EMBED_BATCH_MAX_SIZE,
+    max_wait_ms=settings.EMBED_BATCH_MAX_WAIT_MS,
+)
+
+async def encode_query_async(q):
+    """
+    Encode query thành vector (list), dùng cache theo text đã chuẩn hóa.
+    Cache miss được encode qua embed_batcher nên không chặn event loop.
+    """
+    key = normalize_text(q)
+    q_emb = query_embedding_cache.get(key)
+    if q_emb is None:
+        q_emb = await embed_batcher.encode(q)
+        query_embedding_cache.set(key, q_emb)
+    return q_emb
+
+def encode_queries(texts):
+    """
+    Encode nhiều query (batch search) bằng 1 lần gọi model, dùng chung cache với encode_query_async.
+    Trả về list vector theo thứ tự `texts`.
+    """
+    keys = [normalize_text(t) for t in texts]
+    embs = {k: query_embedding_cache.get(k) for k in set(keys)}
+    missing = {k: t for k, t in zip(keys, texts) if embs[k] is None}
+    if missing:
+        encoded = get_embed_model().encode(list(missing.values()), batch_size=len(missing), show_progress_bar=False)
+        for k, emb in zip(missing, encoded):
+            embs[k] = emb.tolist()
+            query_embedding_cache.set(k, embs[k])
+    return [embs[k] for k in keys]
+
+def fetch_with_distances(ids, q_emb, where=None):
+    """
+    Tính khoảng cách tới q_emb cho các id nằm ngoài kết quả vector query
+    (ứng viên từ index in-memory), áp cùng where clause với query.
+    Chỉ lấy embedding (không lấy metadata); khoảng cách theo squared L2 như collection.query.
+    """
+    if not ids:
+        return [], []
+    data = collection.get(ids=list(ids), where=where, include=["embeddings"])
+    if not data["ids"]:
+        return [], []
+    embs = np.asarray(data["embeddings"], dtype=np.float32)
+    q = np.asarray(q_emb, dtype=np.float32)
+    distances = ((embs - q) ** 2).sum(axis=1).tolist()
+    return data["ids"], distances
+
+def iter_chroma_metadatas(page_size=None):
+    """Duyệt metadata trong Chroma theo từng trang (không tải toàn bộ collection vào RAM)"""
+    page_size = page_size or settings.CHROMA_PAGE_SIZE
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        yield from page["metadatas"]
+        offset += len(page["ids"])
+
+# Chỉ lấy các field cần cho generate_text_and_meta / sync
+RECIPE_PROJECTION = {
+    "name": 1, "nameLowercase": 1, "short": 1, "ingredients": 1, "tags": 1, "instructions": 1,
+    "image": 1, "video": 1, "calories": 1, "time": 1, "size": 1, "difficulty": 1,
+    "cuisine": 1, "category": 1, "rate": 1, "numberOfRate": 1, "updatedAt": 1,
+}
+
+def iter_recipe_batches(query=None, batch_size=256, projection=None):
+    """Duyệt recipes bằng cursor (có projection), trả về từng batch thay vì load toàn bộ"""
+    try:
+        cursor = mongo_collection.find(query or {}, projection or RECIPE_PROJECTION).batch_size(batch_size)
+        batch = []
+        for r in cursor:
+            r["id"] = str(r.pop("_id"))
+            batch.append(r)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    except Exception as e:
+        logger.error("[MongoDB] Error loading recipes: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
 
-def load_recipes():
+def load_recipe_ids():
+    """Tập id của toàn bộ recipe (projection chỉ lấy _id, rất nhẹ)"""
     try:
-        recipes = list(mongo_collection.find())
-        for r in recipes:
-            if "_id" in r:
-                r["id"] = str(r["_id"])
-                del r["_id"]
-            else:
-                print(f"[MongoDB] Warning: Document without _id: {r}")
-        return recipes
+        return {str(r["_id"]) for r in mongo_collection.find({}, {"_id": 1})}
     except Exception as e:
-        print(f"[MongoDB] Error loading recipes: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.error("[MongoDB] Error loading recipe ids: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
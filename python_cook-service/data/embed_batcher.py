@@ -0,0 +1,83 @@
+# data/embed_batcher.py
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from config.logger import get_logger
+
+logger = get_logger("embed")
+
+
+class EmbeddingBatcher:
+    """
+    Gom các query cần encode từ nhiều request đồng thời thành 1 batch:
+    1 worker thread chờ tối đa `max_wait_ms` (hoặc đủ `max_batch_size`),
+    encode cả batch bằng 1 lần forward rồi trả kết quả qua Future của từng request.
+    """
+
+    def __init__(self, encode_batch, max_batch_size=32, max_wait_ms=5):
+        self._encode_batch = encode_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, text):
+        """Đưa text vào hàng đợi, trả về concurrent.futures.Future → list[float]"""
+        self._ensure_started()
+        fut = Future()
+        self._queue.put((text, fut))
+        return fut
+
+    async def encode(self, text):
+        return await asyncio.wrap_future(self.submit(text))
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "pending": self._queue.qsize(),
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [(text, fut) for text, fut in self._collect() if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                embeddings = self._encode_batch([text for text, _ in batch])
+            except Exception as e:
+                logger.error("[Embed] ❌ Batch encode error: %s", e)
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, fut), emb in zip(batch, embeddings):
+                fut.set_result(emb.tolist())
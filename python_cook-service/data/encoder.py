@@ -0,0 +1,65 @@
+# data/encoder.py
+import argparse
+import sys
+import numpy as np
+from config.settings import settings
+
+# torch: PyTorch FP32 (tham chiếu) | onnx: ONNX Runtime FP32 | onnx-int8: ONNX Runtime lượng tử hóa int8
+ENCODER_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Độ tương đồng cosine tối thiểu so với model tham chiếu để chấp nhận 1 backend
+PARITY_MIN_COSINE = 0.98
+
+PARITY_TEXTS = [
+    "Phở bò. Phở bò. Phở bò. Món ăn: Phở bò. Cuisine: Việt Nam. Category: Món nước.",
+    "Bún chả. Món ăn: Bún chả. Nguyên liệu: Thịt heo, Bún, Nước mắm.",
+    "Nguyên liệu: thịt gà, gừng, hành",
+    "cháo gà. Món ăn: cháo gà. Tìm kiếm: cháo gà",
+    "Tags: Healthy, Ăn sáng. Cuisine: Thái",
+    "Cơm tấm sườn bì chả, món ăn sáng phổ biến ở Sài Gòn",
+]
+
+
+def encoder_key(backend=None):
+    """Định danh không gian vector (model + backend): đổi backend thì cache / hash phải đổi theo"""
+    return f"{settings.EMBED_MODEL_NAME}:{backend or settings.EMBED_BACKEND}"
+
+
+def load_encoder(backend=None):
+    """Load SentenceTransformer theo backend; cùng interface .encode() cho search và sync"""
+    # Import ở đây: torch / onnxruntime nặng, không load khi chỉ import module
+    from sentence_transformers import SentenceTransformer
+
+    backend = backend or settings.EMBED_BACKEND
+    if backend == "torch":
+        return SentenceTransformer(settings.EMBED_MODEL_NAME, device="cpu")
+    if backend == "onnx":
+        return SentenceTransformer(settings.EMBED_MODEL_NAME, backend="onnx")
+    if backend == "onnx-int8":
+        return SentenceTransformer(
+            settings.EMBED_MODEL_NAME,
+            backend="onnx",
+            model_kwargs={"file_name": settings.EMBED_ONNX_INT8_FILE},
+        )
+    raise ValueError(f"Unknown EMBED_BACKEND '{backend}', expected one of {ENCODER_BACKENDS}")
+
+
+def check_parity(encoder, reference, texts=PARITY_TEXTS):
+    """Cosine similarity giữa embedding của `encoder` và model tham chiếu trên cùng tập text"""
+    a = np.asarray(encoder.encode(texts, normalize_embeddings=True), dtype=np.float32)
+    b = np.asarray(reference.encode(texts, normalize_embeddings=True), dtype=np.float32)
+    cos = (a * b).sum(axis=1)
+    return {"min": float(cos.min()), "mean": float(cos.mean())}
+
+
+if __name__ == "__main__":
+    # python -m data.encoder --backend onnx-int8
+    parser = argparse.ArgumentParser(description="So sánh 1 encoder backend với model PyTorch tham chiếu")
+    parser.add_argument("--backend", choices=ENCODER_BACKENDS, default=settings.EMBED_BACKEND)
+    parser.add_argument("--min-cosine", type=float, default=PARITY_MIN_COSINE)
+    args = parser.parse_args()
+
+    result = check_parity(load_encoder(args.backend), load_encoder("torch"))
+    ok = result["min"] >= args.min_cosine
+    print(f"[Encoder] {encoder_key(args.backend)} vs torch: min cosine={result['min']:.4f}, mean={result['mean']:.4f} → {'OK' if ok else 'FAIL'}")
+    sys.exit(0 if ok else 1)
@@ -1,20 +1,94 @@
 # data/indexing.py
-from data.db import load_recipes, collection, embed_model, json_util, ingredients_col, tags_col, cuisines_col, categories_col
+from data.db import iter_recipe_batches, load_recipe_ids, iter_chroma_metadatas, collection, get_embed_model, EMBED_MODEL_KEY, json_util, ingredients_col, tags_col, cuisines_col, categories_col
+from data.keyword_index import keyword_index
+from data.ingredient_index import ingredient_index
+from data.suggest_index import suggest_index
+from data.trigram_index import trigram_index
+from data.recipe_store import recipe_store
+from data.sync_state import load_watermark, save_watermark, load_model_key, save_model_key, load_generation, save_generation, load_changes
+from data.encoder import encoder_key
+from data.manifest import manifest
+from config.settings import settings
+from config.logger import get_logger
+from services.metrics import sync_phase, SYNC_SECONDS, SYNC_RECIPES
 from fastapi import HTTPException
 from bson import ObjectId
+from datetime import datetime, timedelta
+import hashlib
 import json
+import numpy as np
+import queue
+import threading
 import time
 from unidecode import unidecode
 
+logger = get_logger("sync")
+
+# Tăng khi thay đổi cấu trúc text/metadata để sync tự index lại toàn bộ
+INDEX_SCHEMA_VERSION = 2
+
+# Các index in-memory dựng từ recipe_store, được sync cập nhật cùng Chroma
+MEMORY_INDEXES = (keyword_index, ingredient_index, suggest_index, trigram_index)
+
+# Đánh dấu kết thúc stream giữa các stage của pipeline
+_PIPELINE_DONE = object()
+
+# Không cho delta sync và full sync chạy chồng lên nhau
+sync_lock = threading.Lock()
+
+# Generation của dữ liệu đang phục vụ trong process này (tăng mỗi lần sync có thêm / sửa / xóa)
+_index_generation = load_generation()
+
+# Id đã ghi / xóa từ lần tăng generation trước (leader ghi kèm generation để follower patch index)
+_upserted_ids, _deleted_ids = set(), set()
+
+
+def index_generation():
+    return _index_generation
+
+
+def set_index_generation(generation):
+    global _index_generation
+    _index_generation = generation
+
+# Mỗi tag lưu thành 1 key boolean để Chroma lọc được bằng where
+TAG_KEY_PREFIX = "tag:"
+
+def tag_key(tag_name):
+    return TAG_KEY_PREFIX + tag_name.strip().lower()
+
+# Trường tham chiếu lookup trong recipe (kind trùng key của build_cache)
+REF_FIELDS = (("ingredients", "ingredients"), ("tags", "tags"), ("cuisines", "cuisine"), ("categories", "category"))
+REF_PROJECTION = {field: 1 for _, field in REF_FIELDS}
+
 def build_cache():
     """Cache lookup nhanh cho ingredients, tags, cuisines, categories"""
     return {
-        "ingredients": {str(i["_id"]): i["name"] for i in ingredients_col.find()},
-        "tags": {str(t["_id"]): t["name"] for t in tags_col.find()},
-        "cuisines": {str(c["_id"]): c["name"] for c in cuisines_col.find()},
-        "categories": {str(c["_id"]): c["name"] for c in categories_col.find()},
+        "ingredients": {str(i["_id"]): i["name"] for i in ingredients_col.find({}, {"name": 1})},
+        "tags": {str(t["_id"]): t["name"] for t in tags_col.find({}, {"name": 1})},
+        "cuisines": {str(c["_id"]): c["name"] for c in cuisines_col.find({}, {"name": 1})},
+        "categories": {str(c["_id"]): c["name"] for c in categories_col.find({}, {"name": 1})},
     }
 
+def recipe_refs(r):
+    """Các (kind, id) lookup mà recipe tham chiếu tới"""
+    refs = []
+    for kind, field in REF_FIELDS:
+        value = r.get(field)
+        if isinstance(value, list):
+            refs.extend((kind, str(oid)) for oid in value if oid)
+        elif value:
+            refs.append((kind, str(value)))
+    return refs
+
+def changed_lookups(cache, previous):
+    """Các (kind, id) có tên khác lần sync trước (đổi tên, bị xóa hoặc mới thêm)"""
+    changed = set()
+    for kind, _ in REF_FIELDS:
+        old, new = previous.get(kind, {}), cache[kind]
+        changed.update((kind, lid) for lid in old.keys() | new.keys() if old.get(lid) != new.get(lid))
+    return changed
+
 def resolve_names(r, cache):
     """Trích tên từ cache"""
     ing_names = [cache["ingredients"].get(str(oid), "") for oid in r.get("ingredients", [])]
@@ -72,59 +146,415 @@ def generate_text_and_meta(r, cache):
         "categoryLowercase": category_name.lower(),
         "rate": r.get("rate", 0.0),
         "numberOfRate": r.get("numberOfRate", 0),
-        "updatedAt": str(r.get("updatedAt", ""))  # để so sánh lần sau
+        "updatedAt": str(r.get("updatedAt", "")),  # để so sánh lần sau
+        "schemaVersion": INDEX_SCHEMA_VERSION,
     }
+    for tag in tag_names:
+        if tag.strip():
+            meta[tag_key(tag)] = True
     return text, meta
 
 
-def sync_recipes_to_chroma():
-    """Đồng bộ MongoDB ↔ ChromaDB (tự động thêm/sửa/xóa)"""
+def text_hash(text):
+    """Hash nội dung text cần embed (kèm model + backend: đổi encoder thì hash đổi theo)"""
+    return hashlib.sha1(f"{EMBED_MODEL_KEY}\n{text}".encode("utf-8")).hexdigest()
+
+
+def needs_update(r, manifest_row, reembed=False):
+    """Recipe chưa có trong manifest, updatedAt khác hoặc được index theo schema cũ thì cần update"""
+    return (
+        reembed
+        or not manifest_row
+        or manifest_row[0] != str(r.get("updatedAt", ""))
+        or manifest_row[1] != INDEX_SCHEMA_VERSION
+    )
+
+
+def max_updated_at(recipes, current=None):
+    """High-water mark: updatedAt lớn nhất đã thấy"""
+    watermark = current
+    for r in recipes:
+        updated = r.get("updatedAt")
+        if isinstance(updated, datetime) and (watermark is None or updated > watermark):
+            watermark = updated
+    return watermark
+
+
+def bootstrap_manifest():
+    """Chroma đã có dữ liệu nhưng chưa có manifest: dựng manifest từ metadata Chroma (theo trang)"""
+    if len(manifest) or collection.count() == 0:
+        return
+    rows = []
+    for meta in iter_chroma_metadatas():
+        rows.append((meta["id"], meta.get("updatedAt", ""), meta.get("schemaVersion") or 0, ""))
+        if len(rows) >= settings.CHROMA_PAGE_SIZE:
+            manifest.upsert(rows)
+            rows = []
+    manifest.upsert(rows)
+    logger.info("[Sync] 📒 Manifest bootstrapped from Chroma: %d recipes.", len(manifest))
+
+
+def bootstrap_refs():
+    """Manifest đã có nhưng chưa có reverse map lookup → recipe: dựng từ Mongo (projection chỉ lấy id tham chiếu)"""
+    if manifest.has_refs() or not len(manifest):
+        return
+    for batch in iter_recipe_batches({}, settings.CHROMA_PAGE_SIZE, REF_PROJECTION):
+        manifest.set_refs(
+            [r["id"] for r in batch],
+            [(kind, ref_id, r["id"]) for r in batch for kind, ref_id in recipe_refs(r)],
+        )
+    logger.info("[Sync] 🔗 Lookup references bootstrapped from MongoDB.")
+
+
+def resolve_embeddings(ids, texts, known):
+    """
+    Lấy embedding cho các text theo thứ tự ưu tiên:
+    cache theo hash → embedding hiện có trong Chroma (text không đổi) → encode bằng model.
+    Trả về (embeddings, hashes, {hash: vector} cần lưu vào cache, số text phải encode)
+    """
+    hashes = [text_hash(t) for t in texts]
+    vectors = manifest.get_embeddings(hashes)
+    new_vectors = {}
+
+    # Text không đổi nhưng chưa có trong cache (được index trước khi có cache): lấy lại từ Chroma
+    same_text_ids = [
+        rid for rid, h in zip(ids, hashes)
+        if h not in vectors and known.get(rid) and known[rid][2] == h
+    ]
+    if same_text_ids:
+        data = collection.get(ids=same_text_ids, include=["embeddings"])
+        by_id = dict(zip(data["ids"], data["embeddings"]))
+        for rid, h in zip(ids, hashes):
+            if rid in by_id:
+                vectors[h] = new_vectors[h] = np.asarray(by_id[rid], dtype=np.float32)
+
+    missing = list({h: t for h, t in zip(hashes, texts) if h not in vectors}.items())
+    if missing:
+        encoded = get_embed_model().encode([t for _, t in missing], batch_size=32, show_progress_bar=False)
+        for (h, _), emb in zip(missing, encoded):
+            vectors[h] = new_vectors[h] = np.asarray(emb, dtype=np.float32)
+
+    return np.stack([vectors[h] for h in hashes]), hashes, new_vectors, len(missing)
+
+
+def upsert_memory_indexes(metas):
+    records = recipe_store.upsert(metas)
+    for index in MEMORY_INDEXES:
+        index.upsert(records)
+
+
+def remove_from_memory_indexes(ids):
+    recipe_store.remove(ids)
+    for index in MEMORY_INDEXES:
+        index.remove(ids)
+
+
+def rebuild_memory_indexes():
+    """Build lại recipe_store (duyệt metadata Chroma theo trang) rồi các index từ khóa / nguyên liệu / gợi ý / trigram"""
+    with sync_phase("memory_index"):
+        recipe_store.rebuild(iter_chroma_metadatas())
+        records = recipe_store.records()
+        for index in MEMORY_INDEXES:
+            index.rebuild(records)
+    logger.info("[Sync] 🔤 Memory indexes built: %d recipes.", len(records))
+
+
+def previous_tag_keys(ids):
+    """{id: tag key hiện có trong Chroma} lấy từ recipe_store, id chưa có trong store thì đọc metadata Chroma"""
+    keys, missing = {}, []
+    for rid in ids:
+        record = recipe_store.get(rid)
+        if record is None:
+            missing.append(rid)
+        else:
+            keys[rid] = {tag_key(tag) for tag in record.tags}
+    if missing:
+        data = collection.get(ids=missing, include=["metadatas"])
+        for meta in data["metadatas"]:
+            if meta:
+                keys[meta["id"]] = {k for k in meta if k.startswith(TAG_KEY_PREFIX)}
+    return keys
+
+
+def clear_stale_tag_keys(metas, previous):
+    """
+    Upsert của Chroma merge metadata (không xóa key cũ): tag key mà recipe không còn (tag bị gỡ / đổi tên)
+    được gán None để Chroma xóa, nếu không filter theo tag cũ vẫn khớp. Trả về metadata để upsert.
+    """
+    result = []
+    for meta in metas:
+        stale = {key: None for key in previous.get(meta["id"], ()) if key not in meta}
+        result.append({**meta, **stale} if stale else meta)
+    return result
+
+
+def write_chunk(ids, texts, metas, embeddings, hashes, new_vectors, refs):
+    """Stage ghi: upsert 1 chunk vào Chroma + manifest (kèm tham chiếu lookup) + cache embedding + index in-memory"""
+    collection.upsert(
+        ids=ids, documents=texts, metadatas=clear_stale_tag_keys(metas, previous_tag_keys(ids)), embeddings=embeddings,
+    )
+    manifest.upsert(
+        (meta["id"], meta["updatedAt"], INDEX_SCHEMA_VERSION, h)
+        for meta, h in zip(metas, hashes)
+    )
+    manifest.set_refs(ids, refs)
+    _upserted_ids.update(ids)
+    _deleted_ids.difference_update(ids)
+    if new_vectors:
+        manifest.put_embeddings(new_vectors.items())
+    upsert_memory_indexes(metas)
+
+
+def _put(q, item, stop):
+    """queue.put có thể dừng khi pipeline bị hủy (tránh treo thread khi queue đầy)"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _read_stage(batches, out_q, stop, errors):
     try:
-        start = time.time()
-        cache = build_cache()
-        recipes = load_recipes()
+        batches = iter(batches)
+        while True:
+            with sync_phase("mongo_load"):
+                batch = next(batches, None)
+            if batch is None or not _put(out_q, batch, stop):
+                return
+    except Exception as e:
+        errors.append(e)
+    finally:
+        _put(out_q, _PIPELINE_DONE, stop)
+
+
+def _write_stage(in_q, errors):
+    while True:
+        chunk = in_q.get()
+        if chunk is _PIPELINE_DONE:
+            return
+        if errors:
+            continue  # pipeline đã lỗi: chỉ xả queue
+        try:
+            with sync_phase("upsert"):
+                write_chunk(*chunk)
+        except Exception as e:
+            errors.append(e)
+
+
+def run_index_pipeline(query, cache, collect_ids=False, reembed=False):
+    """
+    Pipeline index theo chunk, các stage chạy chồng lên nhau qua queue có giới hạn:
+      Mongo cursor (projection, theo batch) → build text + encode → upsert Chroma
+    Chỉ các recipe thay đổi so với manifest mới được encode (reembed=True: encode lại tất cả).
+    Trả về (số recipe đã index, watermark mới, tập id đã quét nếu collect_ids).
+    """
+    read_q = queue.Queue(maxsize=settings.SYNC_PIPELINE_QUEUE_SIZE)
+    write_q = queue.Queue(maxsize=settings.SYNC_PIPELINE_QUEUE_SIZE)
+    stop, errors = threading.Event(), []
+    reader = threading.Thread(
+        target=_read_stage, name="sync-reader", daemon=True,
+        args=(iter_recipe_batches(query, settings.SYNC_BATCH_SIZE), read_q, stop, errors),
+    )
+    writer = threading.Thread(target=_write_stage, name="sync-writer", daemon=True, args=(write_q, errors))
+    reader.start()
+    writer.start()
 
-        # Lấy toàn bộ ID & metadata hiện tại từ Chroma
-        chroma_data = collection.get()
-        chroma_map = {m["id"]: m for m in chroma_data["metadatas"]}
+    scanned, indexed, encoded, watermark = 0, 0, 0, None
+    seen_ids = set() if collect_ids else None
+    start = last_report = time.time()
+    try:
+        while not errors:
+            batch = read_q.get()
+            if batch is _PIPELINE_DONE:
+                break
+            scanned += len(batch)
+            watermark = max_updated_at(batch, watermark)
+            if collect_ids:
+                seen_ids.update(r["id"] for r in batch)
+
+            with sync_phase("diff"):
+                known = manifest.get_many(r["id"] for r in batch)
+                changed = [r for r in batch if needs_update(r, known.get(r["id"]), reembed)]
+            if changed:
+                with sync_phase("build_text"):
+                    texts, metas = zip(*(generate_text_and_meta(r, cache) for r in changed))
+                    ids, texts, metas = [m["id"] for m in metas], list(texts), list(metas)
+                    refs = [(kind, ref_id, r["id"]) for r in changed for kind, ref_id in recipe_refs(r)]
+                with sync_phase("encode"):
+                    embeddings, hashes, new_vectors, n_encoded = resolve_embeddings(ids, texts, known)
+                _put(write_q, (ids, texts, metas, embeddings, hashes, new_vectors, refs), stop)
+                indexed += len(changed)
+                encoded += n_encoded
+
+            if time.time() - last_report >= settings.SYNC_PROGRESS_SECONDS:
+                last_report = time.time()
+                rate = scanned / (last_report - start)
+                logger.info("[Sync] ⏳ Scanned %d, indexed %d, encoded %d (%.0f recipes/s)", scanned, indexed, encoded, rate)
+    finally:
+        write_q.put(_PIPELINE_DONE)
+        writer.join()
+        stop.set()
+        reader.join()
+    if errors:
+        raise errors[0]
+    SYNC_RECIPES.labels("scanned").inc(scanned)
+    SYNC_RECIPES.labels("indexed").inc(indexed)
+    SYNC_RECIPES.labels("encoded").inc(encoded)
+    if indexed:
+        logger.info("[Sync] 🧠 Indexed %d recipes, encoded %d (reused %d cached embeddings).", indexed, encoded, indexed - encoded)
+    return indexed, watermark, seen_ids
+
+
+def patch_memory_indexes(upserted, deleted):
+    """Cập nhật index in-memory chỉ cho các id đã đổi (metadata đọc lại từ Chroma theo trang)"""
+    ids, metas = list(upserted), []
+    for i in range(0, len(ids), settings.CHROMA_PAGE_SIZE):
+        metas += collection.get(ids=ids[i:i + settings.CHROMA_PAGE_SIZE], include=["metadatas"])["metadatas"]
+    found = {meta["id"] for meta in metas}
+    remove_from_memory_indexes(list(set(deleted) | (set(upserted) - found)))
+    if metas:
+        upsert_memory_indexes(metas)
+
+
+def reload_indexes(generation):
+    """
+    Worker follower: mở lại Chroma (leader vừa ghi) rồi patch các id leader đã đổi vào index in-memory.
+    Build lại toàn bộ khi thiếu log thay đổi (full sync, nạp snapshot, follower chậm) hoặc quá nhiều id.
+    """
+    collection.reload()
+    changes = load_changes(index_generation(), generation) if len(recipe_store) else None
+    if changes is None or sum(map(len, changes)) > settings.FOLLOWER_PATCH_MAX_IDS:
+        rebuild_memory_indexes()
+        logger.info("[Sync] 🔄 Reloaded index generation %d.", generation)
+    else:
+        patch_memory_indexes(*changes)
+        logger.info("[Sync] 🔄 Patched index generation %d: %d updated, %d deleted.", generation, *map(len, changes))
+    set_index_generation(generation)
+
+
+def delete_recipes(deleted_ids):
+    if not deleted_ids:
+        return
+    with sync_phase("delete"):
+        collection.delete(ids=deleted_ids)
+        manifest.delete(deleted_ids)
+        remove_from_memory_indexes(deleted_ids)
+    _deleted_ids.update(deleted_ids)
+    _upserted_ids.difference_update(deleted_ids)
+    SYNC_RECIPES.labels("deleted").inc(len(deleted_ids))
+    logger.info("[Sync] 🗑 Deleted %d recipes.", len(deleted_ids))
+
+
+def reindex_lookup_dependents(cache):
+    """
+    Ingredient / tag / cuisine / category đổi tên hoặc bị xóa không làm đổi updatedAt của recipe:
+    diff cache lookup với lần sync trước rồi chỉ index lại các recipe tham chiếu tới entry đã đổi.
+    Tag đổi tên: write_chunk xóa luôn key tag:<tên cũ> của các recipe này (filter theo tên cũ không còn khớp).
+    Trả về số recipe đã index lại.
+    """
+    with sync_phase("lookup_diff"):
+        previous = manifest.load_lookups()
+        changed = changed_lookups(cache, previous) if previous else set()
+        recipe_ids = manifest.referencing(changed) if changed else set()
 
-        mongo_ids = {r["id"] for r in recipes}
-        chroma_ids = set(chroma_map.keys())
+    indexed = 0
+    if recipe_ids:
+        logger.info("[Sync] 🔗 %d lookup entries changed, re-indexing %d dependent recipes.", len(changed), len(recipe_ids))
+        oids = [ObjectId(rid) if ObjectId.is_valid(rid) else rid for rid in recipe_ids]
+        for i in range(0, len(oids), settings.CHROMA_PAGE_SIZE):
+            n, _, _ = run_index_pipeline({"_id": {"$in": oids[i:i + settings.CHROMA_PAGE_SIZE]}}, cache, reembed=True)
+            indexed += n
+    if changed or not previous:
+        manifest.save_lookups(cache)
+    return indexed
 
-        new_or_updated, deleted_ids = [], []
 
-        for r in recipes:
-            rid = str(r["id"])
-            r_updated = str(r.get("updatedAt", ""))
-            chroma_meta = chroma_map.get(rid)
+def full_sync(cache, reembed=False):
+    """Reconcile toàn bộ Mongo ↔ manifest (dùng lần đầu và định kỳ làm fallback)"""
+    indexed, watermark, mongo_ids = run_index_pipeline({}, cache, collect_ids=True, reembed=reembed)
 
-            # Nếu chưa có hoặc updatedAt khác thì cần update
-            if not chroma_meta or chroma_meta.get("updatedAt") != r_updated:
-                new_or_updated.append(r)
+    # Các bản ghi bị xóa trong Mongo
+    with sync_phase("diff"):
+        deleted_ids = list(manifest.ids() - mongo_ids)
+    delete_recipes(deleted_ids)
 
-        # Các bản ghi bị xóa trong Mongo
-        deleted_ids = list(chroma_ids - mongo_ids)
+    # Dọn cache embedding không còn được dùng
+    pruned = manifest.prune_embeddings()
+    if pruned:
+        logger.info("[Sync] 🧹 Pruned %d unused cached embeddings.", pruned)
 
-        if new_or_updated:
-            print(f"[Sync] 🆕 Updating {len(new_or_updated)} recipes...")
-            texts, metas, ids = [], [], []
-            for r in new_or_updated:
-                text, meta = generate_text_and_meta(r, cache)
-                texts.append(text)
-                metas.append(meta)
-                ids.append(r["id"])
+    rebuild_memory_indexes()
 
-            embeddings = embed_model.encode(texts, batch_size=32, show_progress_bar=False)
-            collection.upsert(ids=ids, documents=texts, metadatas=metas, embeddings=embeddings)
+    return indexed, len(deleted_ids), watermark
 
-        if deleted_ids:
-            collection.delete(ids=deleted_ids)
-            print(f"[Sync] 🗑 Deleted {len(deleted_ids)} recipes.")
 
-        print(f"[Sync] ✅ Done. Added/updated: {len(new_or_updated)}, deleted: {len(deleted_ids)}. ({round(time.time()-start,2)}s)")
-    except Exception as e:
-        print(f"[Sync] ❌ Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+def delta_sync(cache, watermark):
+    """
+    Chỉ lấy các recipe có updatedAt >= watermark - SYNC_WATERMARK_LAG_SECONDS (cửa sổ chồng lấn cho các ghi
+    commit muộn, bản ghi không đổi được manifest bỏ qua); phát hiện xóa bằng diff id-only
+    """
+    since = watermark - timedelta(seconds=settings.SYNC_WATERMARK_LAG_SECONDS)
+    indexed, new_watermark, _ = run_index_pipeline({"updatedAt": {"$gte": since}}, cache)
+
+    # Các bản ghi bị xóa trong Mongo: so sánh tập id (projection chỉ lấy _id) với manifest
+    with sync_phase("diff"):
+        deleted_ids = list(manifest.ids() - load_recipe_ids())
+    delete_recipes(deleted_ids)
+
+    return indexed, len(deleted_ids), max(watermark, new_watermark or watermark)
+
+
+def sync_recipes_to_chroma(full=False):
+    """
+    Đồng bộ MongoDB ↔ ChromaDB (tự động thêm/sửa/xóa).
+    Mặc định chạy delta theo watermark updatedAt; chạy full reconcile khi full=True,
+    khi chưa có watermark hoặc khi các index in-memory chưa được build.
+    """
+    with sync_lock:
+        try:
+            start = time.time()
+            cache = build_cache()
+            bootstrap_manifest()
+            bootstrap_refs()
+            watermark = load_watermark()
+
+            # Vector trong Chroma được sinh bởi encoder khác (đổi model / backend): encode lại toàn bộ
+            # (state cũ chưa lưu modelKey → vector được sinh bởi backend torch mặc định)
+            indexed_key = load_model_key(encoder_key("torch"))
+            reembed = indexed_key != EMBED_MODEL_KEY and collection.count() > 0
+            if reembed:
+                logger.warning("[Sync] 🔁 Encoder changed (%s → %s), re-embedding all recipes.", indexed_key, EMBED_MODEL_KEY)
+
+            if full or reembed or watermark is None or len(recipe_store) == 0:
+                mode = "full"
+                changed, deleted, new_watermark = full_sync(cache, reembed=reembed)
+            else:
+                mode = "delta"
+                changed, deleted, new_watermark = delta_sync(cache, watermark)
+            changed += reindex_lookup_dependents(cache)
+
+            if new_watermark is not None and new_watermark != watermark:
+                save_watermark(new_watermark)
+            if load_model_key() != EMBED_MODEL_KEY:
+                save_model_key(EMBED_MODEL_KEY)
+            if changed or deleted:
+                generation = load_generation() + 1
+                save_generation(generation, _upserted_ids, _deleted_ids)
+                _upserted_ids.clear()
+                _deleted_ids.clear()
+                set_index_generation(generation)
+
+            elapsed = time.time() - start
+            SYNC_SECONDS.labels(mode).observe(elapsed)
+            if mode == "full" or changed or deleted:
+                logger.info("[Sync] ✅ Done (%s). Added/updated: %d, deleted: %d. (%.2fs)", mode, changed, deleted, elapsed)
+        except Exception as e:
+            logger.exception("[Sync] ❌ Error: %s", e)
+            raise HTTPException(status_code=500, detail=str(e))
+
 
 
 
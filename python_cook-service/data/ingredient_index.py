@@ -0,0 +1,170 @@
+# data/ingredient_index.py
+import threading
+import numpy as np
+
+# Ngưỡng lọc giống /search: tỉ lệ trùng tối thiểu và độ phủ theo số nguyên liệu của món
+MIN_MATCH_RATIO = 0.5
+
+
+def record_ingredients(record):
+    """Tập tên nguyên liệu (lowercase) của 1 RecipeRecord"""
+    return {ing.lower() for ing in record.ingredients}
+
+
+def coverage_thresholds(n_ings):
+    """Món nhiều nguyên liệu cần trùng nhiều hơn (vector hóa)"""
+    return np.where(n_ings >= 12, 0.35, np.where(n_ings >= 8, 0.30, 0.25))
+
+
+class IngredientMatch:
+    """Kết quả matching nguyên liệu trên toàn bộ corpus"""
+
+    def __init__(self, ids, ord_map, counts, n_ings, mask, n_user):
+        self._ids = ids
+        self._ord_map = ord_map
+        self.counts = counts
+        self.n_ings = n_ings
+        self.mask = mask
+        self.n_user = n_user
+
+    def lookup(self, ids):
+        """
+        (common_count, n_hit_ings, mask) dạng mảng theo thứ tự `ids`;
+        mask = recipe thỏa ngưỡng match_ratio / coverage
+        """
+        ords = np.fromiter((self._ord_map.get(rid, -1) for rid in ids), dtype=np.int64, count=len(ids))
+        valid = (ords >= 0) & (ords < len(self.mask))
+        if not valid.any():
+            return np.zeros(len(ids)), np.ones(len(ids)), np.zeros(len(ids), dtype=bool)
+        safe = np.where(valid, ords, 0)
+        return self.counts[safe], self.n_ings[safe], valid & self.mask[safe]
+
+    def top_ids(self, limit):
+        """Các recipe thỏa ngưỡng có ingredient_signal cao nhất"""
+        cand = np.nonzero(self.mask)[0]
+        if not len(cand):
+            return []
+        common = self.counts[cand]
+        n_ing = self.n_ings[cand]
+        signal = (
+            common / self.n_user * 0.55 +
+            common / n_ing * 0.35 +
+            common / (n_ing + self.n_user - common) * 0.10
+        )
+        if len(cand) > limit:
+            top = np.argpartition(-signal, limit - 1)[:limit]
+            cand, signal = cand[top], signal[top]
+        order = np.argsort(-signal, kind="stable")
+        return [self._ids[o] for o in cand[order]]
+
+
+class IngredientIndex:
+    """
+    Posting index tên nguyên liệu → mảng ordinal recipe (NumPy, đã sort).
+    Cho phép tìm toàn bộ món thỏa match_ratio / coverage bằng phép đếm trên posting,
+    không cần parse chuỗi ingredients của từng ứng viên.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._ids = []          # ordinal → recipe id (None nếu slot trống)
+        self._ord = {}          # recipe id → ordinal
+        self._free = []
+        self._n_ings = np.zeros(0, dtype=np.int32)
+        self._doc_ings = {}     # recipe id → tập nguyên liệu (để gỡ khỏi posting)
+        self._postings = {}     # tên nguyên liệu → np.ndarray[int32] ordinal đã sort
+
+    def __len__(self):
+        return len(self._ord)
+
+    def rebuild(self, records):
+        with self._lock:
+            self._reset()
+            lists = {}
+            for record in records:
+                o = self._alloc(record.id)
+                ings = record_ingredients(record)
+                self._doc_ings[record.id] = ings
+                self._n_ings[o] = len(ings)
+                for ing in ings:
+                    lists.setdefault(ing, []).append(o)
+            self._postings = {ing: np.array(ords, dtype=np.int32) for ing, ords in lists.items()}
+
+    def upsert(self, records):
+        with self._lock:
+            for record in records:
+                self._remove_one(record.id)
+                o = self._alloc(record.id)
+                ings = record_ingredients(record)
+                self._doc_ings[record.id] = ings
+                self._n_ings[o] = len(ings)
+                for ing in ings:
+                    plist = self._postings.get(ing)
+                    if plist is None:
+                        self._postings[ing] = np.array([o], dtype=np.int32)
+                    else:
+                        self._postings[ing] = np.insert(plist, np.searchsorted(plist, o), o)
+
+    def remove(self, ids):
+        with self._lock:
+            for rid in ids:
+                self._remove_one(rid)
+
+    def match(self, user_ings):
+        """Đếm số nguyên liệu trùng cho mọi recipe và áp ngưỡng match_ratio / coverage"""
+        user_ings = {ing.strip().lower() for ing in user_ings if ing.strip()}
+        with self._lock:
+            n_docs = len(self._ids)
+            lists = [self._postings[ing] for ing in user_ings if ing in self._postings]
+            if not lists or not user_ings:
+                empty = np.zeros(0, dtype=np.int32)
+                return IngredientMatch([], {}, empty, empty, np.zeros(0, dtype=bool), max(len(user_ings), 1))
+            counts = np.bincount(np.concatenate(lists), minlength=n_docs)
+            n_ings = self._n_ings[:n_docs].copy()
+            # Snapshot ordinal ↔ id cùng lúc với counts: sync xóa / cấp lại slot sau khi nhả lock không làm lệch kết quả
+            ids, ord_map = list(self._ids), dict(self._ord)
+        n_user = len(user_ings)
+        safe_n = np.maximum(n_ings, 1)
+        mask = (
+            (counts > 0) &
+            (counts / n_user >= MIN_MATCH_RATIO) &
+            (counts / safe_n >= coverage_thresholds(n_ings))
+        )
+        return IngredientMatch(ids, ord_map, counts, safe_n, mask, n_user)
+
+    def _alloc(self, rid):
+        if self._free:
+            o = self._free.pop()
+            self._ids[o] = rid
+        else:
+            o = len(self._ids)
+            self._ids.append(rid)
+            if o >= len(self._n_ings):
+                grown = np.zeros(max(16, 2 * len(self._n_ings)), dtype=np.int32)
+                grown[:len(self._n_ings)] = self._n_ings
+                self._n_ings = grown
+        self._ord[rid] = o
+        return o
+
+    def _remove_one(self, rid):
+        o = self._ord.pop(rid, None)
+        if o is None:
+            return
+        for ing in self._doc_ings.pop(rid, ()):
+            plist = self._postings.get(ing)
+            if plist is None:
+                continue
+            plist = plist[plist != o]
+            if len(plist):
+                self._postings[ing] = plist
+            else:
+                del self._postings[ing]
+        self._ids[o] = None
+        self._n_ings[o] = 0
+        self._free.append(o)
+
+
+ingredient_index = IngredientIndex()
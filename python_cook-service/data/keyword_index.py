@@ -0,0 +1,148 @@
+# data/keyword_index.py
+import heapq
+import math
+import threading
+from unidecode import unidecode
+
+# Tham số BM25 chuẩn
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Tên món quan trọng hơn mô tả ngắn
+NAME_FIELD_WEIGHT = 2.0
+SHORT_FIELD_WEIGHT = 1.0
+
+
+def fold(text):
+    """Chuẩn hóa không dấu, lowercase (giống cách tạo nameNoAccent)"""
+    return unidecode((text or "").lower())
+
+
+def tokenize(text_no_accent):
+    return [w for w in text_no_accent.split() if w]
+
+
+class KeywordDoc:
+    """Các trường đã tokenize sẵn của 1 recipe (tránh tokenize lại mỗi request)"""
+    __slots__ = ("name_no_accent", "name_words", "name_len", "name_first_word", "short_no_accent", "short_words", "short_len")
+
+    def __init__(self, name_no_accent, short_no_accent):
+        name_tokens = tokenize(name_no_accent)
+        short_tokens = tokenize(short_no_accent)
+        self.name_no_accent = name_no_accent
+        self.name_words = frozenset(name_tokens)
+        self.name_len = len(name_tokens)
+        self.name_first_word = name_tokens[0] if name_tokens else ""
+        self.short_no_accent = short_no_accent
+        self.short_words = frozenset(short_tokens)
+        self.short_len = len(short_tokens)
+
+
+def make_doc(record):
+    """KeywordDoc từ RecipeRecord"""
+    return KeywordDoc(record.name_no_accent, fold(record.short))
+
+
+class _FieldPostings:
+    """Posting list token → {recipe_id: tf} cho 1 trường, kèm thống kê độ dài"""
+
+    def __init__(self):
+        self.postings = {}
+        self.total_len = 0
+
+    def add(self, rid, tokens):
+        self.total_len += len(tokens)
+        tf = {}
+        for t in tokens:
+            tf[t] = tf.get(t, 0) + 1
+        for t, c in tf.items():
+            self.postings.setdefault(t, {})[rid] = c
+
+    def remove(self, rid, tokens):
+        self.total_len -= len(tokens)
+        for t in set(tokens):
+            plist = self.postings.get(t)
+            if plist is None:
+                continue
+            plist.pop(rid, None)
+            if not plist:
+                del self.postings[t]
+
+
+class KeywordIndex:
+    """
+    Inverted index (không dấu) trên nameNoAccent + short, chấm điểm BM25.
+    Dùng để sinh ứng viên cho search_by_keyword độc lập với cửa sổ vector.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs = {}
+        self._name = _FieldPostings()
+        self._short = _FieldPostings()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def get(self, rid):
+        return self._docs.get(rid)
+
+    def rebuild(self, records):
+        """Xây lại toàn bộ index từ danh sách RecipeRecord"""
+        docs, name, short = {}, _FieldPostings(), _FieldPostings()
+        for record in records:
+            doc = make_doc(record)
+            docs[record.id] = doc
+            name.add(record.id, tokenize(doc.name_no_accent))
+            short.add(record.id, tokenize(doc.short_no_accent))
+        with self._lock:
+            self._docs, self._name, self._short = docs, name, short
+
+    def upsert(self, records):
+        """Thêm / cập nhật một số recipe"""
+        with self._lock:
+            for record in records:
+                self._remove_one(record.id)
+                doc = make_doc(record)
+                self._docs[record.id] = doc
+                self._name.add(record.id, tokenize(doc.name_no_accent))
+                self._short.add(record.id, tokenize(doc.short_no_accent))
+
+    def remove(self, ids):
+        with self._lock:
+            for rid in ids:
+                self._remove_one(rid)
+
+    def search(self, tokens, limit=100):
+        """Trả về [(recipe_id, bm25_score)] giảm dần, tối đa `limit` phần tử"""
+        with self._lock:
+            n_docs = len(self._docs)
+            if not n_docs or not tokens:
+                return []
+            scores = {}
+            for field, weight, length_attr in (
+                (self._name, NAME_FIELD_WEIGHT, "name_len"),
+                (self._short, SHORT_FIELD_WEIGHT, "short_len"),
+            ):
+                avgdl = field.total_len / n_docs or 1.0
+                for t in set(tokens):
+                    plist = field.postings.get(t)
+                    if not plist:
+                        continue
+                    df = len(plist)
+                    idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                    for rid, tf in plist.items():
+                        dl = getattr(self._docs[rid], length_attr)
+                        norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl))
+                        scores[rid] = scores.get(rid, 0.0) + weight * idf * norm
+            return heapq.nlargest(limit, scores.items(), key=lambda x: x[1])
+
+    def _remove_one(self, rid):
+        doc = self._docs.pop(rid, None)
+        if doc is None:
+            return
+        self._name.remove(rid, tokenize(doc.name_no_accent))
+        self._short.remove(rid, tokenize(doc.short_no_accent))
+
+
+keyword_index = KeywordIndex()
@@ -0,0 +1,61 @@
+# data/leader.py
+import fcntl
+import os
+from config.settings import settings
+
+# File lock cạnh thư mục Chroma: process nào giữ được lock là leader (duy nhất được sync / ghi Chroma)
+LEADER_LOCK_FILE = os.path.join(settings.CHROMA_PATH, "sync.lock")
+
+# Worker follower nhận /reindex: để lại yêu cầu cho leader thực hiện ở lần sync kế tiếp
+REINDEX_REQUEST_FILE = os.path.join(settings.CHROMA_PATH, "reindex.request")
+
+
+class LeaderLock:
+    """flock không chặn; lock tự nhả khi process chết → follower khác lên làm leader"""
+
+    def __init__(self, path=LEADER_LOCK_FILE):
+        self.path = path
+        self._fd = None
+
+    @property
+    def is_leader(self):
+        return self._fd is not None
+
+    def try_acquire(self):
+        if self._fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+def request_reindex():
+    os.makedirs(os.path.dirname(REINDEX_REQUEST_FILE), exist_ok=True)
+    with open(REINDEX_REQUEST_FILE, "w", encoding="utf-8") as f:
+        f.write(str(os.getpid()))
+
+
+def pop_reindex_request():
+    """True (và xóa yêu cầu) nếu có worker đã yêu cầu full reindex"""
+    try:
+        os.remove(REINDEX_REQUEST_FILE)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+leader_lock = LeaderLock()
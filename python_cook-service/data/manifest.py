@@ -0,0 +1,190 @@
+# data/manifest.py
+import os
+import sqlite3
+import threading
+import numpy as np
+from config.settings import settings
+
+# Manifest gọn (id → updatedAt / schemaVersion / hash text) lưu cạnh thư mục Chroma,
+# dùng để diff khi sync thay vì kéo toàn bộ metadata từ Chroma.
+# Cùng file chứa cache embedding theo hash text (content-addressed).
+MANIFEST_FILE = os.path.join(settings.CHROMA_PATH, "sync_manifest.sqlite3")
+
+
+class SyncManifest:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS manifest ("
+            " id TEXT PRIMARY KEY,"
+            " updated_at TEXT NOT NULL,"
+            " schema_version INTEGER NOT NULL,"
+            " text_hash TEXT NOT NULL DEFAULT ''"
+            ")"
+        )
+        # Cache embedding theo hash nội dung text: text không đổi thì không encode lại
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " text_hash TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL"
+            ")"
+        )
+        # Reverse map: ingredient / tag / cuisine / category → các recipe tham chiếu tới nó
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS refs ("
+            " kind TEXT NOT NULL,"
+            " ref_id TEXT NOT NULL,"
+            " recipe_id TEXT NOT NULL,"
+            " PRIMARY KEY (kind, ref_id, recipe_id)"
+            ")"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS refs_recipe ON refs (recipe_id)")
+        # Tên lookup đã dùng ở lần sync trước (diff để phát hiện đổi tên / xóa)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lookups ("
+            " kind TEXT NOT NULL,"
+            " id TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " PRIMARY KEY (kind, id)"
+            ")"
+        )
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM manifest").fetchone()[0]
+
+    def ids(self):
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT id FROM manifest")}
+
+    def get_many(self, ids):
+        """{id: (updated_at, schema_version, text_hash)} cho các id có trong manifest"""
+        ids = list(ids)
+        result = {}
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT id, updated_at, schema_version, text_hash FROM manifest WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                result.update((row[0], row[1:]) for row in rows)
+        return result
+
+    def upsert(self, rows):
+        """rows: iterable (id, updated_at, schema_version, text_hash)"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO manifest (id, updated_at, schema_version, text_hash) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(id) DO UPDATE SET updated_at=excluded.updated_at,"
+                " schema_version=excluded.schema_version, text_hash=excluded.text_hash",
+                rows,
+            )
+            self._conn.commit()
+
+    def delete(self, ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM manifest WHERE id = ?", [(rid,) for rid in ids])
+            self._conn.executemany("DELETE FROM refs WHERE recipe_id = ?", [(rid,) for rid in ids])
+            self._conn.commit()
+
+    def has_refs(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM refs LIMIT 1").fetchone() is not None
+
+    def set_refs(self, recipe_ids, rows):
+        """Thay toàn bộ tham chiếu của `recipe_ids` bằng rows: iterable (kind, ref_id, recipe_id)"""
+        with self._lock:
+            self._conn.executemany("DELETE FROM refs WHERE recipe_id = ?", [(rid,) for rid in recipe_ids])
+            self._conn.executemany("INSERT OR IGNORE INTO refs (kind, ref_id, recipe_id) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def referencing(self, keys):
+        """Tập recipe id tham chiếu tới các lookup `keys`: iterable (kind, ref_id)"""
+        keys = list(keys)
+        result = set()
+        with self._lock:
+            for i in range(0, len(keys), 250):
+                chunk = keys[i:i + 250]
+                rows = self._conn.execute(
+                    "SELECT DISTINCT recipe_id FROM refs WHERE "
+                    + " OR ".join(["(kind = ? AND ref_id = ?)"] * len(chunk)),
+                    [v for key in chunk for v in key],
+                )
+                result.update(row[0] for row in rows)
+        return result
+
+    def load_lookups(self):
+        """{kind: {id: name}} đã lưu ở lần sync trước ({} nếu chưa có)"""
+        result = {}
+        with self._lock:
+            for kind, lid, name in self._conn.execute("SELECT kind, id, name FROM lookups"):
+                result.setdefault(kind, {})[lid] = name
+        return result
+
+    def save_lookups(self, lookups):
+        """lookups: {kind: {id: name}} (thay toàn bộ)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM lookups")
+            self._conn.executemany(
+                "INSERT INTO lookups (kind, id, name) VALUES (?, ?, ?)",
+                ((kind, lid, name) for kind, names in lookups.items() for lid, name in names.items()),
+            )
+            self._conn.commit()
+
+    def backup(self, path):
+        """Chép nguyên manifest (kèm cache embedding, reverse map) ra file sqlite khác (dùng cho snapshot)"""
+        target = sqlite3.connect(path)
+        try:
+            with self._lock:
+                self._conn.backup(target)
+        finally:
+            target.close()
+
+    def restore(self, path):
+        """Thay toàn bộ manifest bằng nội dung file sqlite `path` (nạp snapshot)"""
+        source = sqlite3.connect(path)
+        try:
+            with self._lock:
+                source.backup(self._conn)
+        finally:
+            source.close()
+
+    def get_embeddings(self, hashes):
+        """{text_hash: np.ndarray[float32]} cho các hash đã có trong cache"""
+        hashes = list(set(hashes))
+        result = {}
+        with self._lock:
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE text_hash IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                result.update((h, np.frombuffer(v, dtype=np.float32)) for h, v in rows)
+        return result
+
+    def put_embeddings(self, items):
+        """items: iterable (text_hash, vector)"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (text_hash, vector) VALUES (?, ?)",
+                ((h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in items),
+            )
+            self._conn.commit()
+
+    def prune_embeddings(self):
+        """Xóa embedding không còn recipe nào tham chiếu. Trả về số bản ghi đã xóa"""
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM embeddings WHERE text_hash NOT IN (SELECT text_hash FROM manifest)"
+            )
+            self._conn.commit()
+            return cur.rowcount
+
+
+manifest = SyncManifest(MANIFEST_FILE)
@@ -0,0 +1,74 @@
+# data/popularity.py
+import threading
+import numpy as np
+from data.db import mongo_collection
+
+
+class PopularityStore:
+    """
+    Side store in-memory cho rate / numberOfRate (mảng NumPy theo recipe id).
+    Rating thay đổi liên tục nên không lấy từ metadata Chroma (chỉ cập nhật khi sync):
+    store được refresh định kỳ bằng query projection nhẹ hoặc push trực tiếp qua API.
+    `version` tăng mỗi khi có giá trị đổi → cache kết quả search gắn version này để rating mới hiện ngay.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pos = {}
+        self._rate = np.zeros(0, dtype=np.float64)
+        self._num_rates = np.zeros(0, dtype=np.int64)
+        self.version = 0
+
+    def __len__(self):
+        return len(self._pos)
+
+    def refresh(self):
+        """Nạp lại toàn bộ từ Mongo (chỉ lấy _id, rate, numberOfRate); True nếu có giá trị thay đổi"""
+        pos, rates, nums = {}, [], []
+        for r in mongo_collection.find({}, {"rate": 1, "numberOfRate": 1}):
+            pos[str(r["_id"])] = len(rates)
+            rates.append(r.get("rate") or 0.0)
+            nums.append(r.get("numberOfRate") or 0)
+        rate = np.asarray(rates, dtype=np.float64)
+        num_rates = np.asarray(nums, dtype=np.int64)
+        with self._lock:
+            changed = self._changed(pos, rate, num_rates)
+            self._pos, self._rate, self._num_rates = pos, rate, num_rates
+            if changed:
+                self.version += 1
+        return changed
+
+    def update(self, rid, rate, number_of_rate):
+        """Cập nhật ngay 1 recipe (push từ service review)"""
+        with self._lock:
+            p = self._pos.get(rid)
+            if p is None:
+                p = len(self._pos)
+                self._pos[rid] = p
+                self._rate = np.append(self._rate, 0.0)
+                self._num_rates = np.append(self._num_rates, 0)
+            self._rate[p] = rate
+            self._num_rates[p] = number_of_rate
+            self.version += 1
+
+    def lookup(self, ids, fallback_rates, fallback_nums):
+        """Mảng (rate, numberOfRate) theo thứ tự `ids`; id chưa có trong store lấy giá trị fallback"""
+        with self._lock:
+            pos = np.fromiter((self._pos.get(rid, -1) for rid in ids), dtype=np.int64, count=len(ids))
+            found = pos >= 0
+            if not found.any():
+                return fallback_rates, fallback_nums
+            safe = np.where(found, pos, 0)
+            rates = np.where(found, self._rate[safe], fallback_rates)
+            nums = np.where(found, self._num_rates[safe], fallback_nums)
+        return rates, nums
+
+    def _changed(self, pos, rate, num_rates):
+        """So với dữ liệu hiện tại theo từng id (thứ tự Mongo trả về có thể khác lần trước)"""
+        if pos.keys() != self._pos.keys():
+            return True
+        old = np.fromiter((self._pos[rid] for rid in pos), dtype=np.int64, count=len(pos))
+        return not (np.array_equal(rate, self._rate[old]) and np.array_equal(num_rates, self._num_rates[old]))
+
+
+popularity_store = PopularityStore()
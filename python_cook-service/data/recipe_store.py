@@ -0,0 +1,73 @@
+# data/recipe_store.py
+import threading
+from unidecode import unidecode
+
+
+class RecipeRecord:
+    """Bản ghi gọn của 1 recipe cho search (không có instructions / document)"""
+    __slots__ = (
+        "id", "name", "name_lower", "name_no_accent", "short", "image", "calories", "time",
+        "size", "difficulty", "cuisine", "category", "rate", "number_of_rate", "ingredients", "tags",
+    )
+
+    def __init__(self, meta):
+        self.id = meta["id"]
+        self.name = meta.get("name", "")
+        self.name_lower = meta.get("nameLowercase", self.name.lower())
+        self.name_no_accent = meta.get("nameNoAccent") or unidecode(self.name_lower)
+        self.short = meta.get("short", "")
+        self.image = meta.get("image", "")
+        self.calories = meta.get("calories", 0)
+        self.time = meta.get("time", "")
+        self.size = meta.get("size", "")
+        self.difficulty = meta.get("difficulty", "")
+        self.cuisine = meta.get("cuisine", "")
+        self.category = meta.get("category", "")
+        self.rate = meta.get("rate", 0.0)
+        self.number_of_rate = meta.get("numberOfRate", 0)
+        # Tách sẵn 1 lần khi sync thay vì mỗi request
+        self.ingredients = tuple(ing.strip() for ing in meta.get("ingredients", "").split(",") if ing.strip())
+        self.tags = frozenset(tag.strip().lower() for tag in meta.get("tags", "").split(", ") if tag.strip())
+
+
+class RecipeStore:
+    """
+    Store in-memory id → RecipeRecord, được sync giữ cập nhật.
+    Query Chroma chỉ cần lấy id + distance rồi join với store,
+    không phải deserialize metadata (kèm instructions JSON) mỗi request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}
+
+    def __len__(self):
+        return len(self._records)
+
+    def rebuild(self, metas):
+        records = {meta["id"]: RecipeRecord(meta) for meta in metas}
+        with self._lock:
+            self._records = records
+
+    def upsert(self, metas):
+        """Thêm / cập nhật từ metadata, trả về các RecipeRecord mới"""
+        records = [RecipeRecord(meta) for meta in metas]
+        with self._lock:
+            for record in records:
+                self._records[record.id] = record
+        return records
+
+    def remove(self, ids):
+        with self._lock:
+            for rid in ids:
+                self._records.pop(rid, None)
+
+    def get(self, rid):
+        return self._records.get(rid)
+
+    def records(self):
+        with self._lock:
+            return list(self._records.values())
+
+
+recipe_store = RecipeStore()
@@ -0,0 +1,230 @@
+# data/snapshot.py
+"""
+Snapshot index có version để replica mới khởi động nhanh:
+  <SNAPSHOT_DIR>/gen-<generation>-<timestamp>/
+    embeddings.npy          ma trận float32 (N, dim), nạp bằng mmap (không đọc hết vào RAM)
+    records.jsonl.gz        [id, document, metadata] theo đúng thứ tự hàng của embeddings.npy
+    sync_manifest.sqlite3   bản sao manifest (updatedAt / hash text, cache embedding, reverse map lookup)
+    snapshot.json           version format, generation, encoder, schema, watermark (ghi cuối cùng)
+  <SNAPSHOT_DIR>/LATEST     tên snapshot mới nhất đã ghi xong
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+import numpy as np
+from config.settings import settings
+from config.logger import get_logger
+from data.db import collection, EMBED_MODEL_KEY
+from data.indexing import sync_lock, index_generation, set_index_generation, INDEX_SCHEMA_VERSION
+from data.manifest import manifest
+from data.sync_state import load_watermark, save_watermark, save_model_key, save_generation
+
+logger = get_logger("snapshot")
+
+# Tăng khi đổi cấu trúc file trong snapshot (snapshot cũ sẽ bị bỏ qua khi nạp)
+SNAPSHOT_FORMAT_VERSION = 1
+
+EMBEDDINGS_FILE = "embeddings.npy"
+RECORDS_FILE = "records.jsonl.gz"
+MANIFEST_COPY_FILE = "sync_manifest.sqlite3"
+INFO_FILE = "snapshot.json"
+LATEST_FILE = "LATEST"
+
+
+def _write_atomic(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def latest_snapshot(snapshot_dir=None):
+    """Đường dẫn snapshot mới nhất đã ghi xong, hoặc None"""
+    snapshot_dir = snapshot_dir or settings.SNAPSHOT_DIR
+    try:
+        with open(os.path.join(snapshot_dir, LATEST_FILE), encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(snapshot_dir, name)
+    return path if os.path.isfile(os.path.join(path, INFO_FILE)) else None
+
+
+def read_snapshot_info(path):
+    with open(os.path.join(path, INFO_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _prune_snapshots(snapshot_dir, keep):
+    """Chỉ giữ `keep` snapshot mới nhất (không bao giờ xóa snapshot LATEST đang trỏ tới)"""
+    latest = latest_snapshot(snapshot_dir)
+    names = sorted(
+        (n for n in os.listdir(snapshot_dir) if n.startswith("gen-") and os.path.isdir(os.path.join(snapshot_dir, n))),
+        key=lambda n: os.path.getmtime(os.path.join(snapshot_dir, n)),
+        reverse=True,
+    )
+    for name in names[max(keep, 1):]:
+        path = os.path.join(snapshot_dir, name)
+        if path != latest:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def export_snapshot(snapshot_dir=None):
+    """
+    Ghi generation hiện tại ra 1 snapshot mới (chạy dưới sync lock nên Chroma / manifest nhất quán).
+    Trả về snapshot.json của snapshot vừa ghi.
+    """
+    snapshot_dir = snapshot_dir or settings.SNAPSHOT_DIR
+    if not snapshot_dir:
+        raise ValueError("SNAPSHOT_DIR is not configured")
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    with sync_lock:
+        start = time.time()
+        count = collection.count()
+        if count == 0:
+            raise ValueError("Index is empty, nothing to export")
+        generation = index_generation()
+        name = f"gen-{generation:06d}-{int(start * 1000)}"
+        tmp_path = os.path.join(snapshot_dir, f".tmp-{name}")
+        os.makedirs(tmp_path)
+        try:
+            embeddings, offset = None, 0
+            with gzip.open(os.path.join(tmp_path, RECORDS_FILE), "wt", encoding="utf-8", compresslevel=1) as records:
+                while offset < count:
+                    page = collection.get(
+                        include=["embeddings", "documents", "metadatas"],
+                        limit=settings.CHROMA_PAGE_SIZE, offset=offset,
+                    )
+                    if not page["ids"]:
+                        break
+                    vectors = np.asarray(page["embeddings"], dtype=np.float32)
+                    if embeddings is None:
+                        # Ghi thẳng ra file .npy theo từng trang (không giữ cả ma trận trong RAM)
+                        embeddings = np.lib.format.open_memmap(
+                            os.path.join(tmp_path, EMBEDDINGS_FILE), mode="w+",
+                            dtype=np.float32, shape=(count, vectors.shape[1]),
+                        )
+                    embeddings[offset:offset + len(vectors)] = vectors
+                    for row in zip(page["ids"], page["documents"], page["metadatas"]):
+                        records.write(json.dumps(row, ensure_ascii=False) + "\n")
+                    offset += len(page["ids"])
+            embeddings.flush()
+            if offset != count:
+                raise RuntimeError(f"Chroma returned {offset} of {count} rows while exporting")
+            manifest.backup(os.path.join(tmp_path, MANIFEST_COPY_FILE))
+
+            watermark = load_watermark()
+            info = {
+                "formatVersion": SNAPSHOT_FORMAT_VERSION,
+                "generation": generation,
+                "modelKey": EMBED_MODEL_KEY,
+                "schemaVersion": INDEX_SCHEMA_VERSION,
+                "count": count,
+                "dim": int(embeddings.shape[1]),
+                "watermark": watermark.isoformat() if watermark else None,
+                "createdAt": datetime.now().isoformat(),
+            }
+            _write_atomic(os.path.join(tmp_path, INFO_FILE), json.dumps(info, indent=2))
+            del embeddings
+            os.replace(tmp_path, os.path.join(snapshot_dir, name))
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+    _write_atomic(os.path.join(snapshot_dir, LATEST_FILE), name)
+    _prune_snapshots(snapshot_dir, settings.SNAPSHOT_KEEP)
+    logger.info("[Snapshot] 📦 Exported %s: %d recipes (%.2fs)", name, count, time.time() - start)
+    return info
+
+
+def is_compatible(info):
+    """Snapshot dùng được khi cùng format, cùng encoder (model:backend) và cùng schema text/metadata"""
+    return (
+        info.get("formatVersion") == SNAPSHOT_FORMAT_VERSION
+        and info.get("modelKey") == EMBED_MODEL_KEY
+        and info.get("schemaVersion") == INDEX_SCHEMA_VERSION
+    )
+
+
+def _record_chunks(path, size):
+    chunk = []
+    with gzip.open(os.path.join(path, RECORDS_FILE), "rt", encoding="utf-8") as records:
+        for line in records:
+            chunk.append(json.loads(line))
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_snapshot(path=None):
+    """
+    Nạp snapshot (mặc định: LATEST trong SNAPSHOT_DIR) vào Chroma đang trống + khôi phục manifest và sync state,
+    sau đó chỉ cần sync delta từ watermark của snapshot. Trả về snapshot.json, hoặc None nếu bỏ qua.
+    """
+    path = path or (latest_snapshot() if settings.SNAPSHOT_DIR else None)
+    if path is None:
+        return None
+    info = read_snapshot_info(path)
+    if not is_compatible(info):
+        logger.warning(
+            "[Snapshot] ⚠️ Skipping %s (format %s, encoder %s, schema %s): incompatible with this service.",
+            os.path.basename(path), info.get("formatVersion"), info.get("modelKey"), info.get("schemaVersion"),
+        )
+        return None
+
+    with sync_lock:
+        if collection.count() > 0:
+            logger.info("[Snapshot] Chroma already has data, snapshot not imported.")
+            return None
+        start = time.time()
+        embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+        if embeddings.shape[0] != info["count"]:
+            raise RuntimeError(f"Snapshot {path} is corrupt: {embeddings.shape[0]} embeddings for {info['count']} recipes")
+        offset = 0
+        for chunk in _record_chunks(path, settings.CHROMA_PAGE_SIZE):
+            ids, documents, metadatas = zip(*chunk)
+            collection.upsert(
+                ids=list(ids), documents=list(documents), metadatas=list(metadatas),
+                embeddings=np.ascontiguousarray(embeddings[offset:offset + len(ids)]),
+            )
+            offset += len(ids)
+
+        manifest.restore(os.path.join(path, MANIFEST_COPY_FILE))
+        save_model_key(info["modelKey"])
+        if info.get("watermark"):
+            save_watermark(datetime.fromisoformat(info["watermark"]))
+        save_generation(info["generation"])
+        set_index_generation(info["generation"])
+
+    logger.info(
+        "[Snapshot] 📥 Imported %s: %d recipes, generation %d (%.2fs)",
+        os.path.basename(path), offset, info["generation"], time.time() - start,
+    )
+    return info
+
+
+if __name__ == "__main__":
+    # python -m data.snapshot export [--dir /snapshots]
+    # python -m data.snapshot import [--path /snapshots/gen-000012-1760000000000]
+    parser = argparse.ArgumentParser(description="Export / import snapshot index (Chroma + manifest)")
+    parser.add_argument("action", choices=("export", "import"))
+    parser.add_argument("--dir", default=settings.SNAPSHOT_DIR, help="Thư mục chứa snapshot (export)")
+    parser.add_argument("--path", default=None, help="Snapshot cần nạp (import, mặc định: LATEST)")
+    args = parser.parse_args()
+    if not args.dir and not args.path:
+        parser.error("set SNAPSHOT_DIR or pass --dir / --path")
+
+    if args.action == "export":
+        print(json.dumps(export_snapshot(args.dir), indent=2))
+    else:
+        info = import_snapshot(args.path or latest_snapshot(args.dir))
+        print(json.dumps(info, indent=2) if info else "[Snapshot] Nothing imported")
+        sys.exit(0 if info else 1)
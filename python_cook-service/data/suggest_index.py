@@ -0,0 +1,251 @@
+# data/suggest_index.py
+import bisect
+import heapq
+import threading
+import numpy as np
+from data.keyword_index import fold, tokenize
+from data.popularity import popularity_store
+
+# Chỉ index các hậu tố bắt đầu từ N từ đầu của tên ("pho bo tai" → "pho bo tai", "bo tai", "tai")
+SUGGEST_MAX_WORD_OFFSET = 4
+
+# Prefix khớp nhiều hơn N hậu tố ("b", "bun", ...) có bucket top-N ứng viên tính sẵn lúc rebuild / upsert
+# → mỗi lần tra chỉ đọc tối đa N ứng viên, không phụ thuộc số món khớp prefix
+SUGGEST_MAX_CANDIDATES = 128
+# Bucket bị rút bớt (món bị xóa / đổi tên / tụt hạng) xuống dưới ngưỡng này thì tính lại từ khoảng của prefix
+SUGGEST_BUCKET_REFILL = 64
+
+
+def normalize_prefix(text):
+    """Chuẩn hóa chuỗi người dùng đang gõ giống nameNoAccent (không dấu, lowercase, gộp khoảng trắng)"""
+    return " ".join(tokenize(fold(text)))
+
+
+def name_suffixes(record):
+    """[(hậu tố, vị trí từ)] của nameNoAccent dùng làm key prefix"""
+    words = tokenize(record.name_no_accent)
+    return [(" ".join(words[i:]), i) for i in range(min(len(words), SUGGEST_MAX_WORD_OFFSET))]
+
+
+def popularity_ranks(records):
+    """recipe_id → (-popularity, độ dài tên) lúc index (cùng công thức popularity_scores của ranking)"""
+    ids = [r.id for r in records]
+    rates, num_rates = popularity_store.lookup(
+        ids,
+        np.array([r.rate for r in records], dtype=np.float64),
+        np.array([r.number_of_rate for r in records], dtype=np.int64),
+    )
+    scores = ((rates / 5.0) * np.log1p(num_rates)).tolist()
+    return {rid: (-score, len(r.name)) for rid, score, r in zip(ids, scores, records)}
+
+
+def _candidate(rid, pos, rank):
+    # Thứ tự giống rank_suggestions: khớp đầu tên trước, popularity giảm dần, tên ngắn trước
+    return (pos > 0, *rank[rid], rid, pos)
+
+
+def _scan(entries, lo, hi, rank):
+    """Ứng viên (chưa sort) của khoảng [lo, hi): mỗi recipe lấy vị trí từ nhỏ nhất"""
+    best = {}
+    for _, rid, pos in entries[lo:hi]:
+        if pos < best.get(rid, SUGGEST_MAX_WORD_OFFSET):
+            best[rid] = pos
+    return [_candidate(rid, pos, rank) for rid, pos in best.items()]
+
+
+def _merge(parts):
+    """Top-N của hợp các nhóm ứng viên (1 recipe có thể nằm ở nhiều nhóm con → giữ ứng viên tốt nhất)"""
+    best = {}
+    for part in parts:
+        for cand in part:
+            rid = cand[3]
+            if rid not in best or cand < best[rid]:
+                best[rid] = cand
+    return heapq.nsmallest(SUGGEST_MAX_CANDIDATES, best.values())
+
+
+def _build_buckets(entries, rank, buckets, prefix, lo, hi):
+    """
+    Bucket cho `prefix` (khoảng [lo, hi) lớn hơn SUGGEST_MAX_CANDIDATES) và mọi prefix dài hơn cũng lớn,
+    tính từ dưới lên: top-N của prefix nằm trong hợp top-N của các prefix con dài hơn 1 ký tự.
+    """
+    # Hậu tố đúng bằng prefix đứng đầu khoảng (chuỗi ngắn hơn sort trước)
+    i = bisect.bisect_left(entries, (prefix + "\x00",), lo, hi) if prefix else lo
+    parts = [_scan(entries, lo, i, rank)]
+    while i < hi:
+        child = entries[i][0][:len(prefix) + 1]
+        j = bisect.bisect_left(entries, (child + "\uffff",), i, hi)
+        if j - i > SUGGEST_MAX_CANDIDATES:
+            parts.append(_build_buckets(entries, rank, buckets, child, i, j))
+        elif prefix:
+            parts.append(_scan(entries, i, j, rank))
+        i = j
+    if not prefix:
+        return []
+    buckets[prefix] = _merge(parts)
+    return buckets[prefix]
+
+
+def _splice(entries, drop, adds):
+    """
+    Mảng sort mới = `entries` bỏ các phần tử `drop`, chèn `adds` (đã sort):
+    chỉ bisect vị trí cắt rồi nối các slice, không so sánh lại toàn bộ mảng như sort()
+    """
+    cuts = sorted(
+        [(bisect.bisect_left(entries, e), 1, e) for e in drop]
+        + [(bisect.bisect_left(entries, e), 0, e) for e in adds]
+    )
+    out, start = [], 0
+    for i, is_drop, e in cuts:
+        out += entries[start:i]
+        if not is_drop:
+            out.append(e)
+            start = i
+        elif i < len(entries) and entries[i] == e:
+            start = i + 1
+        else:
+            start = i
+    out += entries[start:]
+    return out
+
+
+def _prefix_range(entries, prefix):
+    lo = bisect.bisect_left(entries, (prefix,))
+    return lo, bisect.bisect_left(entries, (prefix + "\uffff",), lo)
+
+
+class SuggestIndex:
+    """
+    Sorted-prefix array trên các hậu tố theo từ của nameNoAccent cho autocomplete.
+    Tra prefix bằng bisect (không dấu: "pho b" khớp "Phở bò", "bo" khớp "Bún bò Huế");
+    prefix khớp nhiều món đọc bucket top-N tính sẵn thay vì duyệt cả khoảng.
+    Ghi theo kiểu copy-on-write (dựng mảng / bucket mới rồi đổi tham chiếu) nên lookup không phải chờ sync.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()         # đổi tham chiếu (entries, buckets) cho lookup
+        self._write_lock = threading.Lock()   # tuần tự hóa rebuild / upsert / remove
+        self._entries = []  # [(key, recipe_id, vị trí từ)] đã sort
+        self._buckets = {}  # prefix → [ứng viên] đã sort, chỉ cho prefix khớp > SUGGEST_MAX_CANDIDATES hậu tố
+        self._keys = {}     # recipe_id → [(key, vị trí từ)]
+        self._rank = {}     # recipe_id → (-popularity, độ dài tên)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def rebuild(self, records):
+        entries, keys = [], {}
+        for record in records:
+            suffixes = name_suffixes(record)
+            keys[record.id] = suffixes
+            entries.extend((key, record.id, pos) for key, pos in suffixes)
+        entries.sort()
+        rank = popularity_ranks(records)
+        buckets = {}
+        _build_buckets(entries, rank, buckets, "", 0, len(entries))
+        with self._write_lock:
+            self._keys, self._rank = keys, rank
+            with self._lock:
+                self._entries, self._buckets = entries, buckets
+
+    def upsert(self, records):
+        self._apply(records, [record.id for record in records])
+
+    def remove(self, ids):
+        self._apply([], ids)
+
+    def lookup(self, prefix):
+        """
+        {recipe_id: vị trí từ nhỏ nhất khớp prefix} (0 = khớp ngay đầu tên), tối đa SUGGEST_MAX_CANDIDATES món:
+        prefix có bucket trả về top-N theo khớp đầu tên / popularity, còn lại duyệt khoảng [lo, hi) (đã nhỏ)
+        """
+        matches = {}
+        if not prefix:
+            return matches
+        with self._lock:
+            entries, buckets = self._entries, self._buckets
+        bucket = buckets.get(prefix)
+        if bucket is not None:
+            return {cand[3]: cand[4] for cand in bucket}
+        lo, hi = _prefix_range(entries, prefix)
+        for _, rid, pos in entries[lo:hi]:
+            if pos < matches.get(rid, SUGGEST_MAX_WORD_OFFSET):
+                matches[rid] = pos
+        return matches
+
+    def _apply(self, records, ids):
+        with self._write_lock:
+            changed = set(ids)
+            old_suffixes = {rid: self._keys[rid] for rid in changed if rid in self._keys}
+            new_suffixes = {record.id: name_suffixes(record) for record in records}
+            if not old_suffixes and not new_suffixes:
+                return
+            old_buckets, entries = self._buckets, _splice(
+                self._entries,
+                [(key, rid, pos) for rid, suffixes in old_suffixes.items() for key, pos in suffixes],
+                sorted((key, rid, pos) for rid, suffixes in new_suffixes.items() for key, pos in suffixes),
+            )
+            counts = {}
+
+            def count(prefix):
+                if prefix not in counts:
+                    lo, hi = _prefix_range(entries, prefix)
+                    counts[prefix] = hi - lo
+                return counts[prefix]
+
+            # Bucket luôn nằm trên chuỗi prefix liên tiếp từ ký tự đầu của 1 key → dừng ở prefix nhỏ đầu tiên
+            removed, added = {}, {}  # prefix → {recipe_id: vị trí từ nhỏ nhất}
+            for rid, suffixes in old_suffixes.items():
+                for key, pos in suffixes:
+                    for n in range(1, len(key) + 1):
+                        if key[:n] not in old_buckets:
+                            break
+                        best = removed.setdefault(key[:n], {})
+                        best[rid] = min(pos, best.get(rid, pos))
+            for rid, suffixes in new_suffixes.items():
+                for key, pos in suffixes:
+                    for n in range(1, len(key) + 1):
+                        if key[:n] not in old_buckets and count(key[:n]) <= SUGGEST_MAX_CANDIDATES:
+                            break
+                        best = added.setdefault(key[:n], {})
+                        best[rid] = min(pos, best.get(rid, pos))
+
+            # Ứng viên cũ tính bằng rank cũ (đúng tuple đang nằm trong bucket) trước khi cập nhật rank
+            removed = {
+                prefix: [_candidate(rid, pos, self._rank) for rid, pos in best.items()]
+                for prefix, best in removed.items()
+            }
+            for rid in changed:
+                self._keys.pop(rid, None)
+                self._rank.pop(rid, None)
+            self._keys.update(new_suffixes)
+            if records:
+                self._rank.update(popularity_ranks(records))
+
+            buckets = dict(old_buckets)
+            for prefix in removed.keys() | added.keys():
+                if count(prefix) <= SUGGEST_MAX_CANDIDATES:
+                    buckets.pop(prefix, None)
+                    continue
+                bucket = buckets.get(prefix)
+                if bucket is not None:
+                    # Bucket = đúng top-len(bucket) của prefix: chỉ chèn ứng viên xếp trên phần tử cuối
+                    bucket = list(bucket)
+                    for cand in removed.get(prefix, ()):
+                        i = bisect.bisect_left(bucket, cand)
+                        if i < len(bucket) and bucket[i] == cand:
+                            del bucket[i]
+                    for rid, pos in added.get(prefix, {}).items():
+                        cand = _candidate(rid, pos, self._rank)
+                        if bucket and cand < bucket[-1]:
+                            bisect.insort(bucket, cand)
+                    del bucket[SUGGEST_MAX_CANDIDATES:]
+                if bucket is None or len(bucket) < SUGGEST_BUCKET_REFILL:
+                    lo, hi = _prefix_range(entries, prefix)
+                    bucket = heapq.nsmallest(SUGGEST_MAX_CANDIDATES, _scan(entries, lo, hi, self._rank))
+                buckets[prefix] = bucket
+
+            with self._lock:
+                self._entries, self._buckets = entries, buckets
+
+suggest_index = SuggestIndex()
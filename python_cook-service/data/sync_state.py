@@ -0,0 +1,96 @@
+# data/sync_state.py
+import json
+import os
+from datetime import datetime
+from config.settings import settings
+from config.logger import get_logger
+
+logger = get_logger("sync")
+
+# Trạng thái sync lưu cạnh thư mục Chroma
+SYNC_STATE_FILE = os.path.join(settings.CHROMA_PATH, "sync_state.json")
+
+# Số generation gần nhất giữ danh sách id đã đổi (follower chậm hơn thế thì rebuild toàn bộ)
+CHANGE_LOG_GENERATIONS = 20
+
+
+def load_sync_state():
+    try:
+        with open(SYNC_STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("[Sync] ⚠️ Cannot read sync state, ignoring: %s", e)
+        return {}
+
+
+def save_sync_state(state):
+    """Ghi atomically (file tạm + rename) để không bị hỏng khi process dừng giữa chừng"""
+    os.makedirs(os.path.dirname(SYNC_STATE_FILE), exist_ok=True)
+    tmp = SYNC_STATE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, SYNC_STATE_FILE)
+
+
+def load_watermark():
+    """updatedAt lớn nhất đã được sync (datetime) hoặc None"""
+    value = load_sync_state().get("watermark")
+    return datetime.fromisoformat(value) if value else None
+
+
+def save_watermark(watermark):
+    state = load_sync_state()
+    state["watermark"] = watermark.isoformat()
+    save_sync_state(state)
+
+
+def load_model_key(default=None):
+    """Encoder (model:backend) đã sinh các vector hiện có trong Chroma"""
+    return load_sync_state().get("modelKey", default)
+
+
+def save_model_key(model_key):
+    state = load_sync_state()
+    state["modelKey"] = model_key
+    save_sync_state(state)
+
+
+def load_generation():
+    """Generation của index trên đĩa: leader tăng mỗi khi sync thêm / sửa / xóa dữ liệu"""
+    return load_sync_state().get("generation", 0)
+
+
+def save_generation(generation, upserted=None, deleted=None):
+    """
+    Ghi generation mới kèm id thêm / sửa và id xóa của generation đó để follower chỉ patch các id này.
+    upserted=None (full sync, nạp snapshot) hoặc quá FOLLOWER_PATCH_MAX_IDS id → không ghi log, follower rebuild.
+    """
+    state = load_sync_state()
+    state["generation"] = generation
+    changes = [c for c in state.get("changes", []) if c["generation"] < generation][-(CHANGE_LOG_GENERATIONS - 1):]
+    if upserted is not None and len(upserted) + len(deleted or ()) <= settings.FOLLOWER_PATCH_MAX_IDS:
+        changes.append({"generation": generation, "upserted": sorted(upserted), "deleted": sorted(deleted or ())})
+    state["changes"] = changes
+    save_sync_state(state)
+
+
+def load_changes(since, generation):
+    """
+    (upserted, deleted) gộp theo thứ tự các generation trong (since, generation],
+    None nếu log không phủ liên tục khoảng này
+    """
+    if generation <= since:
+        return None
+    changes = {c["generation"]: c for c in load_sync_state().get("changes", [])}
+    upserted, deleted = set(), set()
+    for g in range(since + 1, generation + 1):
+        change = changes.get(g)
+        if change is None:
+            return None
+        upserted.difference_update(change["deleted"])
+        deleted.update(change["deleted"])
+        deleted.difference_update(change["upserted"])
+        upserted.update(change["upserted"])
+    return upserted, deleted
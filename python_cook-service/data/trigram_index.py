@@ -0,0 +1,126 @@
+# data/trigram_index.py
+import heapq
+import threading
+from data.keyword_index import tokenize
+
+# Ngưỡng similarity (Jaccard trên tập trigram, giống pg_trgm) để coi 2 từ là gần đúng
+TRIGRAM_MIN_SIMILARITY = 0.35
+
+# Chỉ sửa lỗi gõ cho từ đủ dài ("ga" ↔ "gao" quá dễ nhầm), tối đa N từ thay thế cho mỗi từ
+TRIGRAM_MIN_WORD_LEN = 4
+TRIGRAM_MAX_EXPANSIONS = 3
+
+
+def trigrams(word):
+    """Tập trigram của 1 từ (đệm 2 space đầu, 1 space cuối như pg_trgm)"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Trigram index trên từ vựng tên món không dấu (nameNoAccent) cho khớp gần đúng khi gõ sai.
+    Tra cứu chạy trên từ vựng (nhỏ hơn corpus rất nhiều) nên thời gian không phụ thuộc số recipe.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._words = {}     # từ → {recipe_id}
+        self._trigrams = {}  # trigram → {từ}
+        self._names = {}     # recipe_id → các từ trong tên
+
+    def __len__(self):
+        return len(self._names)
+
+    def rebuild(self, records):
+        words, grams, names = {}, {}, {}
+        for record in records:
+            name_words = frozenset(tokenize(record.name_no_accent))
+            names[record.id] = name_words
+            for word in name_words:
+                if word not in words:
+                    words[word] = set()
+                    for g in trigrams(word):
+                        grams.setdefault(g, set()).add(word)
+                words[word].add(record.id)
+        with self._lock:
+            self._words, self._trigrams, self._names = words, grams, names
+
+    def upsert(self, records):
+        with self._lock:
+            for record in records:
+                self._remove_one(record.id)
+                name_words = frozenset(tokenize(record.name_no_accent))
+                self._names[record.id] = name_words
+                for word in name_words:
+                    if word not in self._words:
+                        self._words[word] = set()
+                        for g in trigrams(word):
+                            self._trigrams.setdefault(g, set()).add(word)
+                    self._words[word].add(record.id)
+
+    def remove(self, ids):
+        with self._lock:
+            for rid in ids:
+                self._remove_one(rid)
+
+    def similar_words(self, word):
+        """{từ trong từ vựng: similarity} gần đúng với `word` (tối đa TRIGRAM_MAX_EXPANSIONS từ)"""
+        grams = trigrams(word)
+        with self._lock:
+            shared = {}
+            for g in grams:
+                for candidate in self._trigrams.get(g, ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+        scored = []
+        for candidate, common in shared.items():
+            similarity = common / (len(grams) + len(trigrams(candidate)) - common)
+            if similarity >= TRIGRAM_MIN_SIMILARITY:
+                scored.append((similarity, candidate))
+        return {candidate: similarity for similarity, candidate in heapq.nlargest(TRIGRAM_MAX_EXPANSIONS, scored)}
+
+    def expand(self, tokens):
+        """
+        Mỗi từ khóa → {từ gần đúng: similarity}. Chỉ sửa các từ không có trong từ vựng tên món
+        (từ gõ đúng giữ nguyên cách khớp chính xác) → {} cho từ đã có hoặc quá ngắn.
+        """
+        with self._lock:
+            return [
+                {} if len(token) < TRIGRAM_MIN_WORD_LEN or token in self._words else self.similar_words(token)
+                for token in tokens
+            ]
+
+    def search(self, expansions, limit=100):
+        """[(recipe_id, điểm)] giảm dần: tổng similarity tốt nhất của từng từ khóa trong tên món"""
+        scores = {}
+        with self._lock:
+            for similar in expansions:
+                best = {}
+                for word, similarity in similar.items():
+                    for rid in self._words.get(word, ()):
+                        if similarity > best.get(rid, 0.0):
+                            best[rid] = similarity
+                for rid, similarity in best.items():
+                    scores[rid] = scores.get(rid, 0.0) + similarity
+        return heapq.nlargest(limit, scores.items(), key=lambda x: x[1])
+
+    def _remove_one(self, rid):
+        name_words = self._names.pop(rid, None)
+        if name_words is None:
+            return
+        for word in name_words:
+            rids = self._words.get(word)
+            if rids is None:
+                continue
+            rids.discard(rid)
+            if not rids:
+                del self._words[word]
+                for g in trigrams(word):
+                    words = self._trigrams.get(g)
+                    if words is not None:
+                        words.discard(word)
+                        if not words:
+                            del self._trigrams[g]
+
+
+trigram_index = TrigramIndex()
@@ -1,11 +1,27 @@
 # main.py
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from config.logger import setup_logging
 from routes.api import router
-from data.indexing import sync_recipes_to_chroma
+from services.metrics import HTTP_REQUEST_SECONDS, render_metrics
+from services.startup import readiness, start_background_startup, shutdown
 from fastapi.middleware.cors import CORSMiddleware
-from apscheduler.schedulers.background import BackgroundScheduler
+from fastapi.middleware.gzip import GZipMiddleware
+from config.settings import settings
+from services.responses import ORJSONResponse
 
-app = FastAPI(title="Recipe Search Service")
+setup_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load model, warmup, sync lần đầu và scheduler chạy nền → app nhận request ngay
+    start_background_startup()
+    yield
+    shutdown()
+
+app = FastAPI(title="Recipe Search Service", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Thêm CORS middleware
 app.add_middleware(
@@ -16,6 +32,21 @@ app.add_middleware(
     allow_headers=["*"],  # cho phép tất cả headers
 )
 
+# Nén gzip response lớn khi client gửi Accept-Encoding: gzip (danh sách hit cho mobile)
+if settings.GZIP_MINIMUM_SIZE > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE, compresslevel=settings.GZIP_COMPRESS_LEVEL)
+
+# Thời gian xử lý theo route (label theo path template, không theo URL thật)
+@app.middleware("http")
+async def observe_request_time(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.labels(
+        request.method, route.path if route else "unmatched", str(response.status_code)
+    ).observe(time.perf_counter() - start)
+    return response
+
 # Include router
 app.include_router(router, prefix="/api", tags=["recipe"])
 
@@ -24,14 +55,18 @@ app.include_router(router, prefix="/api", tags=["recipe"])
 async def ping():
     return "Service is alive!"
 
-# Lần đầu chạy
-sync_recipes_to_chroma()
+# Readiness probe: 200 khi model đã warmup và index đã load, 503 trong lúc startup
+@app.api_route("/ready", methods=["GET", "HEAD"])
+async def ready():
+    status = readiness.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
 
-# Tự động reindex mỗi 1 giờ
-scheduler = BackgroundScheduler()
-scheduler.add_job(sync_recipes_to_chroma, 'interval', hours=1)
-scheduler.start()
+# Prometheus scrape endpoint (multiprocess: đọc file của mọi worker → chạy trong threadpool)
+@app.get("/metrics")
+def metrics():
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
 
 # if __name__ == "__main__":
 #     import uvicorn
-#     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+#     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
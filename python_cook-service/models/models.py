@@ -7,10 +7,28 @@ class SearchRequest(BaseModel):
     cuisine: Optional[str] = None
     category: Optional[str] = None
     top_k: int = 20
+    page_size: Optional[int] = None  # Bật cursor pagination (bỏ qua top_k)
+    cursor: Optional[str] = None  # next_cursor của trang trước
+    fields: Optional[List[str]] = None  # Chỉ trả về các trường này của hit (ví dụ ["name", "image"]), id luôn có
 
 class KeywordSearchRequest(BaseModel):
     keywords: str = ""  # Chuỗi từ khóa (ví dụ: "phở bò" hoặc "thịt bò")
     tags: List[str] = []  # Danh sách tags để filter
     cuisine: Optional[str] = None  # Thêm cuisine (tuỳ chọn)
     category: Optional[str] = None  # Thêm category (tuỳ chọn)
-    top_k: int = 20  # Số kết quả tối đa
\ No newline at end of file
+    top_k: int = 20  # Số kết quả tối đa
+    page_size: Optional[int] = None  # Bật cursor pagination (bỏ qua top_k)
+    cursor: Optional[str] = None  # next_cursor của trang trước
+    fields: Optional[List[str]] = None  # Chỉ trả về các trường này của hit, id luôn có
+    debug: bool = False  # Kèm `_debug` (điểm từng thành phần) trong mỗi hit
+
+class BatchSearchRequest(BaseModel):
+    requests: List[SearchRequest] = []
+
+class BatchKeywordSearchRequest(BaseModel):
+    requests: List[KeywordSearchRequest] = []
+
+class PopularityUpdate(BaseModel):
+    id: str  # recipe id
+    rate: float = 0.0
+    numberOfRate: int = 0
@@ -1,16 +1,145 @@
 # routes/api.py
-from fastapi import APIRouter, HTTPException
-from models.models import SearchRequest, KeywordSearchRequest
-from data.db import collection, embed_model
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from models.models import SearchRequest, KeywordSearchRequest, PopularityUpdate, BatchSearchRequest, BatchKeywordSearchRequest
+from data.db import encode_query_async, encode_queries, query_embedding_cache, embed_batcher
+from data.keyword_index import keyword_index
+from data.ingredient_index import ingredient_index
+from data.popularity import popularity_store
+from data.suggest_index import suggest_index, normalize_prefix
+from data.trigram_index import trigram_index
+from services.ranking import collect_candidates, query_neighbours, rank_ingredient_hits, rank_keyword_hits, rank_suggestions, HIT_FIELDS
+from services.responses import ORJSONResponse
+from config.settings import settings
+from config.logger import get_logger, debug_sampled
+from services.metrics import search_stage
 from unidecode import unidecode
-from typing import List
-import math
-from data.indexing import sync_recipes_to_chroma
+import json
+from data.cache import SearchResultCache
+from data.indexing import sync_recipes_to_chroma, tag_key, index_generation
+from services.startup import readiness, is_leader
+from services.pagination import page_snapshots, decode_cursor
+from data.leader import request_reindex
+from data.snapshot import export_snapshot
 
 router = APIRouter()
-
-@router.post("/search")
-def search(req: SearchRequest):
+logger = get_logger("search")
+
+# Payload giống nhau (tag trang chủ, keyword trending, ...) trả thẳng từ cache cho tới khi index hoặc rating đổi
+search_result_cache = SearchResultCache(
+    maxsize=settings.SEARCH_RESULT_CACHE_SIZE,
+    ttl=settings.SEARCH_RESULT_CACHE_TTL,
+)
+
+# Gợi ý theo prefix đã chuẩn hóa + generation / popularity version (prefix ngắn khớp rất nhiều món, tính lại tốn hơn)
+suggest_cache = SearchResultCache(
+    maxsize=settings.SUGGEST_CACHE_SIZE,
+    ttl=settings.SUGGEST_CACHE_TTL,
+)
+
+def cache_generation():
+    """Generation của index + version của popularity: đổi 1 trong 2 → response đã cache bị bỏ"""
+    return index_generation(), popularity_store.version
+
+def cached_result(kind, req):
+    """(key, response đã cache hoặc None) cho generation hiện tại của index / popularity"""
+    generation = cache_generation()
+    search_result_cache.bind_generation(generation)
+    key = SearchResultCache.request_key(kind, req, generation)
+    return key, search_result_cache.get(key)
+
+async def cursor_page(kind, req, model, rank_pool):
+    """
+    Trang tiếp theo của cursor. Worker chưa có snapshot (cursor do worker khác cấp, hoặc hết TTL)
+    rank lại pool của cùng request khi index vẫn ở generation của cursor; index đã đổi → 410.
+    """
+    pool_req, generation, offset, page_size = decode_cursor(req.cursor, kind, model)
+    page_size = req.page_size or page_size
+    page = page_snapshots.page(kind, pool_req, generation, offset, page_size)
+    if page is None:
+        if generation != index_generation():
+            raise HTTPException(status_code=410, detail="Cursor expired (index changed), run the search again")
+        page = page_snapshots.store(kind, pool_req, generation, await rank_pool(pool_req), offset, page_size)
+    return page
+
+def require_ready():
+    """Trong lúc startup (model chưa warmup / index chưa load) trả 503 để gateway thử replica khác"""
+    if not readiness.ready:
+        raise HTTPException(status_code=503, detail="Search index is warming up")
+
+def build_where(tags, cuisine, category):
+    """Chuyển filter tags/cuisine/category thành where clause của Chroma (None nếu không lọc)"""
+    clauses = [{tag_key(tag): True} for tag in tags if tag.strip()]
+    if cuisine:
+        clauses.append({"cuisineLowercase": cuisine.lower()})
+    if category:
+        clauses.append({"categoryLowercase": category.lower()})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def vector_window(top_k):
+    """Số neighbour lấy từ Chroma cho 1 request"""
+    return min(top_k * 5, 100)
+
+def group_neighbours(items, q_embs):
+    """
+    Batch search: items = [(where, n_results)] → 1 collection.query (nhiều query_embeddings)
+    cho mỗi where clause khác nhau. Trả về neighbours theo thứ tự items.
+    """
+    groups = {}
+    for i, (where, _) in enumerate(items):
+        groups.setdefault(json.dumps(where, sort_keys=True), []).append(i)
+    neighbours = [None] * len(items)
+    for idxs in groups.values():
+        where = items[idxs[0]][0]
+        n_results = max(items[i][1] for i in idxs)
+        for i, nb in zip(idxs, query_neighbours([q_embs[i] for i in idxs], where, n_results)):
+            neighbours[i] = nb
+    return neighbours
+
+def hit_fields(req):
+    """Các trường hit được chọn (id luôn đứng đầu) hoặc None nếu trả đầy đủ; tên trường lạ → 400"""
+    if req.fields is None:
+        return None
+    unknown = [name for name in req.fields if name not in HIT_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)} (allowed: {', '.join(HIT_FIELDS)})",
+        )
+    return ("id", *dict.fromkeys(name for name in req.fields if name != "id"))
+
+def check_batch(requests):
+    """Giới hạn số request trong 1 batch, kiểm tra fields và không cho phân trang trong từng request"""
+    if len(requests) > settings.BATCH_SEARCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch too large (max {settings.BATCH_SEARCH_MAX_ITEMS} requests)")
+    for i, req in enumerate(requests):
+        if req.cursor is not None or req.page_size is not None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"requests[{i}]: cursor / page_size are not supported in batch search, use the single endpoint",
+            )
+        hit_fields(req)
+
+def build_search_query(req: SearchRequest):
+    """Build query text cho embedding từ SearchRequest"""
+    ingredients_text = ", ".join(req.ingredients) if req.ingredients else ""
+    tags_text = ", ".join(req.tags) if req.tags else ""
+    
+    q = f"Nguyên liệu: {ingredients_text}"
+    if tags_text:
+        q += f". Tags: {tags_text}"
+    if req.cuisine:
+        q += f". Cuisine: {req.cuisine}"
+    if req.category:
+        q += f". Category: {req.category}"
+    if not q.strip():
+        q = "Tìm món"
+    return q
+
+@router.post("/search", dependencies=[Depends(require_ready)])
+async def search(req: SearchRequest):
     """
     Tìm kiếm theo danh sách nguyên liệu với scoring thông minh:
     - Ưu tiên món có nhiều nguyên liệu khớp
@@ -18,146 +147,121 @@ def search(req: SearchRequest):
     - Tính đến rating và popularity
     """
     try:
-        # Build query text cho embedding
-        ingredients_text = ", ".join(req.ingredients) if req.ingredients else ""
-        tags_text = ", ".join(req.tags) if req.tags else ""
-        
-        q = f"Nguyên liệu: {ingredients_text}"
-        if tags_text:
-            q += f". Tags: {tags_text}"
-        if req.cuisine:
-            q += f". Cuisine: {req.cuisine}"
-        if req.category:
-            q += f". Category: {req.category}"
-        if not q.strip():
-            q = "Tìm món"
-
-        print(f"[Search] Ingredients query: {req.ingredients}")
-
-        # Encode query thành vector
-        q_emb = embed_model.encode(q).tolist()
-
-        # Query ChromaDB
-        results = collection.query(
-            query_embeddings=[q_emb],
-            n_results=min(req.top_k * 5, 100),
-            include=["metadatas", "distances"]
-        )
+        # Trang tiếp theo: cắt từ snapshot đã rank (rank lại pool nếu cursor do worker khác cấp)
+        if req.cursor:
+            return ORJSONResponse(await cursor_page("search", req, SearchRequest, rank_search_pool))
+
+        hit_fields(req)
+        q = build_search_query(req)
+
+        if req.page_size is not None:
+            generation = index_generation()
+            result = await rank_search_pool(req)
+            return ORJSONResponse(page_snapshots.first_page("search", req, generation, result))
+
+        key, cached = cached_result("search", req)
+        if cached is not None:
+            return ORJSONResponse({**cached, "query": q})
+
+        debug_sampled(logger, "[Search] Ingredients query: %s", req.ingredients)
+
+        # Encode query thành vector (gom batch với các request đồng thời)
+        with search_stage("search", "encode"):
+            q_emb = await encode_query_async(q)
+
+        # Query Chroma + re-rank là code đồng bộ → chạy trong threadpool
+        result = await run_in_threadpool(run_search, req, q, q_emb)
+        search_result_cache.set(key, result)
+        return ORJSONResponse(result)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("[Search] Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
 
-        hits = []
-        if results and results.get("ids"):
-            for i, rid in enumerate(results["ids"][0]):
-                meta = results["metadatas"][0][i]
-                
-                # Parse ingredients và tags
-                hit_ings = set(ing.strip().lower() for ing in meta.get("ingredients", "").split(", ") if ing.strip())
-                user_ings = set(ing.strip().lower() for ing in req.ingredients)
-                hit_tags = set(tag.strip().lower() for tag in meta.get("tags", "").split(", ") if tag.strip())
-                user_tags = set(tag.strip().lower() for tag in req.tags)
-
-                # === FILTERS ===
-                # Tags filter
-                tags_match = user_tags.issubset(hit_tags) if user_tags else True
-                if not tags_match:
-                    continue
-
-                # Cuisine filter
-                hit_cuisine = meta.get("cuisineLowercase", "")
-                user_cuisine = req.cuisine.lower() if req.cuisine else None
-                cuisine_match = not user_cuisine or hit_cuisine == user_cuisine
-                if not cuisine_match:
-                    continue
-
-                # Category filter
-                hit_category = meta.get("categoryLowercase", "")
-                user_category = req.category.lower() if req.category else None
-                category_match = not user_category or hit_category == user_category
-                if not category_match:
-                    continue
-
-                # === SCORING ===
-                # 1. Ingredient matching score (ưu tiên trùng nguyên liệu cao hơn vector)
-                if user_ings:
-                    common_ings = hit_ings & user_ings
-                    common_count = len(common_ings)
-                    match_ratio = common_count / len(user_ings)
-                    coverage_ratio = common_count / len(hit_ings) if len(hit_ings) > 0 else 0
-                    union_count = len(hit_ings | user_ings)
-                    jaccard = common_count / union_count if union_count else 0
-
-                    # Ngưỡng tối thiểu về độ phủ nguyên liệu: món nhiều nguyên liệu cần trùng nhiều hơn
-                    coverage_threshold = 0.25
-                    if len(hit_ings) >= 12:
-                        coverage_threshold = 0.35
-                    elif len(hit_ings) >= 8:
-                        coverage_threshold = 0.30
-
-                    # Loại bỏ món có độ phủ thấp hoặc tỉ lệ trùng thấp
-                    if match_ratio < 0.5:
-                        continue
-                    if coverage_ratio < coverage_threshold:
-                        continue
-
-                    ingredient_signal = (
-                        match_ratio * 0.55 +
-                        coverage_ratio * 0.35 +
-                        jaccard * 0.10
-                    )
-                    ingredient_score = ingredient_signal * 1500
-                else:
-                    # Không có nguyên liệu filter
-                    ingredient_score = 500
-
-                # 2. Vector similarity
-                distance = results["distances"][0][i]
-                vector_score = 1000 / (1 + distance) if distance >= 0 else 0
-
-                # 3. Popularity score
-                rate = meta.get("rate", 0.0)
-                num_rates = meta.get("numberOfRate", 0)
-                popularity_score = (rate / 5.0) * math.log(1 + num_rates) * 100
-
-                # === TỔNG HỢP ===
-                relevance_score = (
-                    ingredient_score * 3.0 +    # Ưu tiên nguyên liệu khớp mạnh hơn
-                    vector_score * 0.3 +        # Vector chỉ hỗ trợ
-                    popularity_score * 0.4      # Popularity
-                )
-
-                ingredients_raw = meta.get("ingredients", "")
-                ingredients_list = [ing.strip() for ing in ingredients_raw.split(",") if ing.strip()]
-
-                hits.append({
-                    "id": meta.get("id"),
-                    "name": meta.get("name"),
-                    "short": meta.get("short", ""),
-                    "image": meta.get("image", ""),
-                    "calories": meta.get("calories", 0),
-                    "time": meta.get("time", ""),
-                    "size": meta.get("size", ""),
-                    "difficulty": meta.get("difficulty", ""),
-                    "cuisine": meta.get("cuisine", ""),
-                    "category": meta.get("category", ""),
-                    "rate": rate,
-                    "numberOfRate": num_rates,
-                    "ingredients": ingredients_list,
-                    "distance": distance,
-                    "relevance_score": relevance_score,
-                    "match_ratio": match_ratio if user_ings else 1.0
-                })
-
-        # Sort theo relevance_score
-        hits = sorted(hits, key=lambda x: x["relevance_score"], reverse=True)[:req.top_k]
-        
-        print(f"[Search] Found {len(hits)} results")
-
-        return {"query": q, "hits": hits}
+async def rank_search_pool(req: SearchRequest):
+    """Rank pool PAGINATION_POOL_SIZE hit cho cursor pagination /search"""
+    q = build_search_query(req)
+    debug_sampled(logger, "[Search] Ingredients query (paginated): %s", req.ingredients)
+    with search_stage("search", "encode"):
+        q_emb = await encode_query_async(q)
+    return await run_in_threadpool(run_search, req, q, q_emb, None, settings.PAGINATION_POOL_SIZE)
+
+def run_search(req: SearchRequest, q, q_emb, neighbours=None, pool=None):
+    """
+    Query ChromaDB và re-rank kết quả /search cho 1 query đã encode
+    (pool: rank `pool` kết quả thay vì top_k, dùng cho cursor pagination)
+    """
+    top_k = pool or req.top_k
+    # Lọc tags/cuisine/category ngay trong ANN search
+    where = build_where(req.tags, req.cuisine, req.category)
+
+    # Matching nguyên liệu trên toàn bộ corpus bằng posting index,
+    # gộp thêm các món khớp tốt nhất nằm ngoài cửa sổ vector
+    with search_stage("search", "index_lookup"):
+        user_ings = set(ing.strip().lower() for ing in req.ingredients if ing.strip())
+        ing_match = ingredient_index.match(user_ings) if user_ings else None
+        extra_ids = ing_match.top_ids(max(settings.INGREDIENT_CANDIDATES, pool or 0)) if ing_match is not None else []
+
+    with search_stage("search", "chroma_query"):
+        cands = collect_candidates(q_emb, where, pool or vector_window(top_k), extra_ids, neighbours)
+    hits = rank_ingredient_hits(cands, user_ings, ing_match, top_k, hit_fields(req))
+
+    debug_sampled(logger, "[Search] Found %d results", len(hits))
+
+    return {"query": q, "hits": hits}
+
+@router.post("/search/batch", dependencies=[Depends(require_ready)])
+async def search_batch(batch: BatchSearchRequest):
+    """
+    Nhiều /search trong 1 lần gọi: encode tất cả query bằng 1 batch,
+    1 collection.query cho mỗi nhóm filter, re-rank từng request riêng
+    """
+    check_batch(batch.requests)
+    try:
+        return ORJSONResponse(await run_in_threadpool(run_search_batch, batch.requests))
     except Exception as e:
-        print(f"[Search] Error: {e}")
+        logger.exception("[Search] Batch error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/search/search-by-keyword")
-def search_by_keyword(req: KeywordSearchRequest):
+def run_search_batch(requests):
+    results, pending = [None] * len(requests), []
+    for i, req in enumerate(requests):
+        q = build_search_query(req)
+        key, cached = cached_result("search", req)
+        if cached is not None:
+            results[i] = {**cached, "query": q}
+        else:
+            pending.append((i, req, q, key))
+
+    if pending:
+        with search_stage("search", "encode"):
+            q_embs = encode_queries([q for _, _, q, _ in pending])
+        with search_stage("search", "chroma_query"):
+            neighbours = group_neighbours(
+                [(build_where(req.tags, req.cuisine, req.category), vector_window(req.top_k)) for _, req, _, _ in pending],
+                q_embs,
+            )
+        for (i, req, q, key), q_emb, nb in zip(pending, q_embs, neighbours):
+            results[i] = run_search(req, q, q_emb, nb)
+            search_result_cache.set(key, results[i])
+
+    return {"results": results}
+
+def parse_keywords(req: KeywordSearchRequest):
+    """(keywords đã strip, danh sách từ khóa không dấu)"""
+    keywords = req.keywords.strip()
+    keywords_lower = keywords.lower()
+    keywords_no_accent = unidecode(keywords_lower)
+    keyword_list = [kw.strip() for kw in keywords_no_accent.split() if kw.strip()]
+    return keywords, keyword_list
+
+def build_keyword_query(keywords):
+    """Build query text với trọng số cao cho tên món"""
+    return f"{keywords}. Món ăn: {keywords}. Tìm kiếm: {keywords}"
+
+@router.post("/search/search-by-keyword", dependencies=[Depends(require_ready)])
+async def search_by_keyword(req: KeywordSearchRequest):
     """
     Tìm kiếm theo keyword với thuật toán thông minh như Google/YouTube:
     1. Exact match (khớp chính xác) - điểm cao nhất
@@ -166,247 +270,174 @@ def search_by_keyword(req: KeywordSearchRequest):
     4. Partial match (một số từ) - điểm thấp
     """
     try:
+        # Trang tiếp theo: cắt từ snapshot đã rank (rank lại pool nếu cursor do worker khác cấp)
+        if req.cursor:
+            return ORJSONResponse(await cursor_page("keyword", req, KeywordSearchRequest, rank_keyword_pool))
+
+        hit_fields(req)
+
         # Chuẩn hóa query
-        keywords = req.keywords.strip()
+        keywords, keyword_list = parse_keywords(req)
         if not keywords:
-            return {"query": "", "hits": []}
-        
-        keywords_lower = keywords.lower()
-        keywords_no_accent = unidecode(keywords_lower)
-        keyword_list = [kw.strip() for kw in keywords_no_accent.split() if kw.strip()]
-        
+            return ORJSONResponse({"query": "", "hits": []})
+
         if not keyword_list:
-            return {"query": keywords, "hits": []}
+            return ORJSONResponse({"query": keywords, "hits": []})
 
-        print(f"[Search] Query: '{keywords}' → Keywords: {keyword_list}")
+        if req.page_size is not None:
+            generation = index_generation()
+            result = await rank_keyword_pool(req)
+            return ORJSONResponse(page_snapshots.first_page("keyword", req, generation, result))
 
-        # Build query text với trọng số cao cho tên món
-        q = f"{keywords}. Món ăn: {keywords}. Tìm kiếm: {keywords}"
+        key, cached = cached_result("keyword", req)
+        if cached is not None:
+            return ORJSONResponse({**cached, "query": keywords})
 
-        # Encode query thành vector
-        q_emb = embed_model.encode(q).tolist()
+        debug_sampled(logger, "[Search] Query: '%s' → Keywords: %s", keywords, keyword_list)
 
-        # Query ChromaDB với nhiều kết quả hơn để có thể re-rank
-        results = collection.query(
-            query_embeddings=[q_emb],
-            n_results=min(req.top_k * 5, 100),  # Lấy nhiều để re-rank
-            include=["metadatas", "distances"]
-        )
+        q = build_keyword_query(keywords)
 
-        hits = []
-        if results and results.get("ids"):
-            for i, rid in enumerate(results["ids"][0]):
-                meta = results["metadatas"][0][i]
-                
-                # Lấy các text fields để matching
-                name = meta.get('name', '')
-                name_lower = meta.get('nameLowercase', name.lower())
-                name_no_accent = meta.get('nameNoAccent', unidecode(name_lower))
-                short = meta.get('short', '').lower()
-                short_no_accent = unidecode(short)
-                
-                # Kiểm tra filters trước (nhanh hơn)
-                # Tags filter
-                hit_tags = set(tag.strip().lower() for tag in meta.get("tags", "").split(", ") if tag.strip())
-                user_tags = set(tag.strip().lower() for tag in req.tags)
-                tags_match = user_tags.issubset(hit_tags) if user_tags else True
-                
-                if not tags_match:
-                    continue
-
-                # Cuisine filter
-                hit_cuisine = meta.get("cuisineLowercase", "")
-                user_cuisine = req.cuisine.lower() if req.cuisine else None
-                cuisine_match = not user_cuisine or hit_cuisine == user_cuisine
-                
-                if not cuisine_match:
-                    continue
-
-                # Category filter
-                hit_category = meta.get("categoryLowercase", "")
-                user_category = req.category.lower() if req.category else None
-                category_match = not user_category or hit_category == user_category
-                
-                if not category_match:
-                    continue
-
-                # === SCORING SYSTEM (Giống Google) ===
-                
-                # 1. EXACT MATCH - Khớp chính xác toàn bộ query (score cao nhất)
-                exact_match_score = 0
-                if keywords_no_accent == name_no_accent:
-                    exact_match_score = 1000  # Điểm cực cao - match chính xác 100%
-                elif keywords_lower == name_lower:
-                    exact_match_score = 900
-                # Substring exact match: Chỉ cho điểm cao nếu là WORD BOUNDARY
-                # Ví dụ: "bún chả" trong "bún chả hà nội" ✅
-                # Nhưng: "chao" trong "chao ga" ✅ (này sẽ được xử lý bởi phrase match)
-                elif len(keyword_list) >= 2 and (" " + keywords_no_accent + " ") in (" " + name_no_accent + " "):
-                    # Thêm space để đảm bảo word boundary
-                    exact_match_score = 800
-                elif len(keyword_list) >= 2 and (" " + keywords_lower + " ") in (" " + name_lower + " "):
-                    exact_match_score = 700
-                
-                # 2. PHRASE MATCH - Chuỗi từ liên tiếp xuất hiện
-                phrase_match_score = 0
-                if len(keyword_list) >= 2:
-                    # Kiểm tra chuỗi từ có xuất hiện liên tiếp không
-                    query_phrase = " ".join(keyword_list)
-                    if query_phrase in name_no_accent:
-                        phrase_match_score = 500
-                    elif query_phrase in short_no_accent:
-                        phrase_match_score = 300
-                
-                # 3. ALL WORDS MATCH - Tất cả từ có mặt (không nhất thiết liên tiếp)
-                # Tách thành words (từ riêng biệt), không dùng substring matching
-                name_words = set(name_no_accent.split())
-                short_words = set(short_no_accent.split())
-                
-                # Chỉ match CHÍNH XÁC từ, không phải substring
-                # Ví dụ: "ga" match với "ga" nhưng KHÔNG match với "nga"
-                matched_in_name = sum(1 for kw in keyword_list if kw in name_words)
-                matched_in_short = sum(1 for kw in keyword_list if kw in short_words)
-                
-                all_words_match_score = 0
-                if matched_in_name == len(keyword_list):
-                    all_words_match_score = 400  # Match TẤT CẢ từ trong NAME → Điểm cao
-                elif matched_in_short == len(keyword_list):
-                    all_words_match_score = 100  # Match TẤT CẢ từ trong SHORT → Điểm thấp hơn (giảm từ 200 xuống 100)
-                
-                # 4. PARTIAL MATCH - Một số từ khớp (BM25-like scoring)
-                partial_match_score = 0
-                if matched_in_name > 0:
-                    # Tỷ lệ từ khớp trong name
-                    match_ratio = matched_in_name / len(keyword_list)
-                    partial_match_score = match_ratio * 300
-                elif matched_in_short > 0:
-                    # Tỷ lệ từ khớp trong short description
-                    match_ratio = matched_in_short / len(keyword_list)
-                    partial_match_score = match_ratio * 150
-                
-                # CHÚ Ý: Nếu không match từ nào cả (matched_in_name = 0 và matched_in_short = 0)
-                # thì partial_match_score = 0, và exact/phrase cũng = 0
-                # → keyword_relevance sẽ = 0 → sẽ bị skip ở dưới
-
-                # 5. POSITION BOOST - Từ xuất hiện ở đầu tên món được ưu tiên
-                position_score = 0
-                name_first_word = name_no_accent.split()[0] if name_no_accent.split() else ""
-                if name_first_word and keyword_list and keyword_list[0] == name_first_word:
-                    position_score = 100
-
-                # === KEYWORD MATCHING SCORE ===
-                # Tổng điểm từ keyword matching (không tính vector và popularity)
-                keyword_relevance = (
-                    exact_match_score +
-                    phrase_match_score +
-                    all_words_match_score +
-                    partial_match_score +
-                    position_score
-                )
-                
-                # === THRESHOLD THÔNG MINH HƠN ===
-                # Ưu tiên NAME hơn SHORT (như Google/YouTube)
-                
-                # Rule 1: Query 1 từ (như "phở", "gà") - BẮT BUỘC match trong NAME
-                if len(keyword_list) == 1:
-                    if matched_in_name == 0:
-                        print(f"[Search] ❌ Skip '{name}' - Single-word query must match in NAME (matched_in_name=0)")
-                        continue
-                
-                # Rule 2: Query 2+ từ (như "cháo gà", "phở bò") - Linh hoạt hơn
-                else:
-                    # Case A: Nếu match ít nhất 50% trong NAME → OK (ví dụ: "cháo gà" → "Cháo gà hầm", match 2/2)
-                    name_match_percentage = matched_in_name / len(keyword_list)
-                    
-                    # Case B: Nếu có exact/phrase match → OK luôn
-                    has_strong_match = exact_match_score > 0 or phrase_match_score > 0
-                    
-                    # Case C: Match trong SHORT chỉ chấp nhận nếu match >= 100% (tất cả từ)
-                    short_match_percentage = matched_in_short / len(keyword_list)
-                    
-                    # Quyết định: Phải thỏa ít nhất 1 trong 3 điều kiện
-                    if not has_strong_match:
-                        # Không có exact/phrase → Phải match đủ từ
-                        if name_match_percentage < 0.5 and short_match_percentage < 1.0:
-                            print(f"[Search] ❌ Skip '{name}' - Insufficient match (name={matched_in_name}/{len(keyword_list)}={name_match_percentage*100:.0f}%, short={matched_in_short}/{len(keyword_list)}={short_match_percentage*100:.0f}%)")
-                            continue
-                        
-                        # Nếu chỉ match trong SHORT (không match trong NAME) → Phải 100%
-                        if matched_in_name == 0 and short_match_percentage < 1.0:
-                            print(f"[Search] ❌ Skip '{name}' - Match only in SHORT but not 100% ({matched_in_short}/{len(keyword_list)})")
-                            continue
-                
-                print(f"[Search] ✅ Match '{name}' - keyword_relevance={keyword_relevance:.0f} (exact={exact_match_score}, phrase={phrase_match_score}, name_match={matched_in_name}/{len(keyword_list)}, short_match={matched_in_short}/{len(keyword_list)})")
-
-                # 6. VECTOR SIMILARITY - Khoảng cách vector (semantic)
-                distance = results["distances"][0][i]
-                # Chuyển distance thành score (distance nhỏ → score cao)
-                vector_score = 1000 / (1 + distance) if distance >= 0 else 0
-                
-                # 7. POPULARITY SCORE - Rating và số lượng đánh giá
-                rate = meta.get("rate", 0.0)
-                num_rates = meta.get("numberOfRate", 0)
-                popularity_score = (rate / 5.0) * math.log(1 + num_rates) * 50
-
-                # === TỔNG HỢP ĐIỂM ===
-                # Trọng số theo độ ưu tiên (giống Google/YouTube)
-                # Tăng vector_score để tìm kiếm semantic thông minh hơn
-                relevance_score = (
-                    exact_match_score * 5.0 +      # Ưu tiên cao nhất
-                    phrase_match_score * 3.0 +     # Ưu tiên cao
-                    all_words_match_score * 2.0 +  # Ưu tiên trung bình
-                    partial_match_score * 1.0 +    # Ưu tiên thấp
-                    position_score * 1.5 +         # Boost cho từ đầu tiên
-                    vector_score * 1.0 +           # Semantic similarity (TĂNG từ 0.3 lên 1.0 để tìm kiếm thông minh)
-                    popularity_score * 0.5         # Popularity (chỉ boost thêm)
-                )
-
-                # Lúc này relevance_score > 0 là chắc chắn (do đã check keyword_relevance > 0)
-                if relevance_score > 0:
-                    ingredients_raw = meta.get("ingredients", "")
-                    ingredients_list = [ing.strip() for ing in ingredients_raw.split(",") if ing.strip()]
-                    
-                    hits.append({
-                        "id": meta.get("id"),
-                        "name": meta.get("name"),
-                        "short": meta.get("short", ""),
-                        "image": meta.get("image", ""),
-                        "calories": meta.get("calories", 0),
-                        "time": meta.get("time", ""),
-                        "size": meta.get("size", ""),
-                        "difficulty": meta.get("difficulty", ""),
-                        "cuisine": meta.get("cuisine", ""),
-                        "category": meta.get("category", ""),
-                        "rate": rate,
-                        "numberOfRate": num_rates,
-                        "ingredients": ingredients_list,
-                        "distance": distance,
-                        "relevance_score": relevance_score,
-                        # Debug info (có thể bỏ sau)
-                        "_debug": {
-                            "exact": exact_match_score,
-                            "phrase": phrase_match_score,
-                            "all_words": all_words_match_score,
-                            "partial": partial_match_score,
-                            "position": position_score,
-                            "vector": round(vector_score, 2),
-                            "popularity": round(popularity_score, 2)
-                        }
-                    })
-
-        # Sort theo relevance_score giảm dần
-        hits = sorted(hits, key=lambda x: x["relevance_score"], reverse=True)[:req.top_k]
-        
-        print(f"[Search] Found {len(hits)} results")
-        if hits:
-            print(f"[Search] Top result: '{hits[0]['name']}' (score: {hits[0]['relevance_score']:.2f})")
-
-        return {"query": keywords, "hits": hits}
+        # Encode query thành vector (gom batch với các request đồng thời)
+        with search_stage("keyword", "encode"):
+            q_emb = await encode_query_async(q)
+
+        # Query Chroma + re-rank là code đồng bộ → chạy trong threadpool
+        result = await run_in_threadpool(run_search_by_keyword, req, keywords, keyword_list, q_emb)
+        search_result_cache.set(key, result)
+        return ORJSONResponse(result)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"[Search] Error: {e}")
+        logger.exception("[Search] Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
-    
+
+async def rank_keyword_pool(req: KeywordSearchRequest):
+    """Rank pool PAGINATION_POOL_SIZE hit cho cursor pagination search-by-keyword"""
+    keywords, keyword_list = parse_keywords(req)
+    if not keyword_list:
+        return {"query": keywords, "hits": []}
+    debug_sampled(logger, "[Search] Query (paginated): '%s' → Keywords: %s", keywords, keyword_list)
+    with search_stage("keyword", "encode"):
+        q_emb = await encode_query_async(build_keyword_query(keywords))
+    return await run_in_threadpool(
+        run_search_by_keyword, req, keywords, keyword_list, q_emb, None, settings.PAGINATION_POOL_SIZE
+    )
+
+def run_search_by_keyword(req: KeywordSearchRequest, keywords, keyword_list, q_emb, neighbours=None, pool=None):
+    """
+    Query ChromaDB và re-rank kết quả search-by-keyword cho 1 query đã encode
+    (pool: rank `pool` kết quả thay vì top_k, dùng cho cursor pagination)
+    """
+    top_k = pool or req.top_k
+    # Lọc tags/cuisine/category ngay trong ANN search
+    where = build_where(req.tags, req.cuisine, req.category)
+
+    # Gộp thêm ứng viên từ inverted index BM25 và trigram index cho từ gõ sai (không phụ thuộc cửa sổ vector)
+    with search_stage("keyword", "index_lookup"):
+        limit = max(settings.KEYWORD_CANDIDATES, pool or 0)
+        lexical_hits = keyword_index.search(keyword_list, limit=limit)
+        bm25_scores = dict(lexical_hits)
+        expansions = trigram_index.expand(keyword_list)
+        fuzzy_hits = trigram_index.search(expansions, limit=limit) if any(expansions) else []
+        extra_ids = list(dict.fromkeys(rid for rid, _ in lexical_hits + fuzzy_hits))
+
+    with search_stage("keyword", "chroma_query"):
+        cands = collect_candidates(q_emb, where, pool or vector_window(top_k), extra_ids, neighbours)
+    hits = rank_keyword_hits(cands, keywords, keyword_list, bm25_scores, top_k, hit_fields(req), req.debug, expansions)
+
+    debug_sampled(logger, "[Search] Found %d results", len(hits))
+    if hits:
+        debug_sampled(logger, "[Search] Top result: '%s'", hits[0].get("name", hits[0]["id"]))
+
+    return {"query": keywords, "hits": hits}
+
+@router.post("/search/search-by-keyword/batch", dependencies=[Depends(require_ready)])
+async def search_by_keyword_batch(batch: BatchKeywordSearchRequest):
+    """Nhiều search-by-keyword trong 1 lần gọi (1 batch encode, 1 collection.query mỗi nhóm filter)"""
+    check_batch(batch.requests)
+    try:
+        return ORJSONResponse(await run_in_threadpool(run_search_by_keyword_batch, batch.requests))
+    except Exception as e:
+        logger.exception("[Search] Batch error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def run_search_by_keyword_batch(requests):
+    results, pending = [None] * len(requests), []
+    for i, req in enumerate(requests):
+        keywords, keyword_list = parse_keywords(req)
+        if not keyword_list:
+            results[i] = {"query": keywords, "hits": []}
+            continue
+        key, cached = cached_result("keyword", req)
+        if cached is not None:
+            results[i] = {**cached, "query": keywords}
+        else:
+            pending.append((i, req, keywords, keyword_list, key))
+
+    if pending:
+        with search_stage("keyword", "encode"):
+            q_embs = encode_queries([build_keyword_query(keywords) for _, _, keywords, _, _ in pending])
+        with search_stage("keyword", "chroma_query"):
+            neighbours = group_neighbours(
+                [(build_where(req.tags, req.cuisine, req.category), vector_window(req.top_k)) for _, req, _, _, _ in pending],
+                q_embs,
+            )
+        for (i, req, keywords, keyword_list, key), q_emb, nb in zip(pending, q_embs, neighbours):
+            results[i] = run_search_by_keyword(req, keywords, keyword_list, q_emb, nb)
+            search_result_cache.set(key, results[i])
+
+    return {"results": results}
+
+@router.get("/search/suggest", dependencies=[Depends(require_ready)])
+async def suggest(q: str = "", limit: int = Query(10, ge=1, le=50)):
+    """
+    Autocomplete khi người dùng đang gõ: tra prefix không dấu trên tên món (in-memory),
+    không encode bằng model và không query Chroma.
+    """
+    prefix = normalize_prefix(q)
+    generation = cache_generation()
+    suggest_cache.bind_generation(generation)
+    key = (generation, prefix, limit)
+    suggestions = suggest_cache.get(key)
+    if suggestions is None:
+        suggestions = rank_suggestions(suggest_index.lookup(prefix), limit)
+        suggest_cache.set(key, suggestions)
+    return ORJSONResponse({"query": q, "suggestions": suggestions})
+
+@router.get("/search/cache-stats")
+def cache_stats():
+    return {
+        "search_results": search_result_cache.stats(),
+        "suggest": suggest_cache.stats(),
+        "page_snapshots": page_snapshots.stats(),
+        "query_embedding": query_embedding_cache.stats(),
+        "embed_batcher": embed_batcher.stats(),
+    }
+
+@router.post("/popularity")
+def push_popularity(update: PopularityUpdate):
+    """Cập nhật rating của 1 món ngay lập tức (không cần chờ sync / không đụng tới Chroma)"""
+    # version tăng → cache search / gợi ý của worker này bỏ kết quả cũ; worker khác thấy ở lần refresh kế tiếp
+    popularity_store.update(update.id, update.rate, update.numberOfRate)
+    return {"message": "Popularity updated"}
+
 @router.post("/reindex")
 async def reindex_data():
-    sync_recipes_to_chroma()
-    return {"message": "Reindex completed"}
\ No newline at end of file
+    if not is_leader():
+        # Chỉ leader được ghi Chroma: để lại yêu cầu, leader full sync ở lần chạy kế tiếp
+        request_reindex()
+        return {"message": "Reindex scheduled on sync leader"}
+    # Full reconcile (có thể phải chờ sync lock của lần sync định kỳ) → chạy trong threadpool, không chặn event loop
+    await run_in_threadpool(sync_recipes_to_chroma, full=True)
+    return {"message": "Reindex completed"}
+
+@router.post("/snapshot")
+async def snapshot_export():
+    """Export generation hiện tại ra SNAPSHOT_DIR cho replica mới nạp lúc startup"""
+    if not is_leader():
+        raise HTTPException(status_code=409, detail="Snapshot export runs on the sync leader")
+    try:
+        info = await run_in_threadpool(export_snapshot)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": "Snapshot exported", "snapshot": info}
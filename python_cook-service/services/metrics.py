@@ -0,0 +1,79 @@
+# services/metrics.py
+"""
+Histogram Prometheus cho từng stage của search và từng phase của sync, expose qua /metrics.
+Chạy nhiều worker (uvicorn --workers N): đặt env PROMETHEUS_MULTIPROC_DIR (thư mục riêng cho service),
+mỗi process ghi giá trị ra file mmap trong thư mục đó và /metrics gộp của mọi worker.
+"""
+import fcntl
+import os
+from prometheus_client import CollectorRegistry, Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+
+# prometheus_client chọn chế độ multiprocess theo env này lúc import → phải có trong env trước khi start worker
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+_multiproc_run_fd = None
+
+
+def reset_multiproc_dir(path):
+    """
+    Xóa file metric của lần chạy trước, chỉ khi chưa có worker nào đang sống dùng thư mục:
+    mỗi worker giữ shared flock trên .run.lock suốt đời process, lấy được exclusive lock = worker đầu tiên
+    của lần chạy mới (worker chết giữa chừng giữ nguyên file → counter gộp không bị giảm).
+    """
+    global _multiproc_run_fd
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, ".cleanup.lock"), "w") as guard:
+        fcntl.flock(guard, fcntl.LOCK_EX)
+        fd = os.open(os.path.join(path, ".run.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            for name in os.listdir(path):
+                if name.endswith(".db"):
+                    os.remove(os.path.join(path, name))
+        except BlockingIOError:
+            pass
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        _multiproc_run_fd = fd
+
+
+# Dọn trước khi process này tạo file metric đầu tiên
+if MULTIPROC_DIR:
+    reset_multiproc_dir(MULTIPROC_DIR)
+
+SEARCH_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SYNC_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "cook_http_request_seconds", "Thời gian xử lý request theo route",
+    ["method", "route", "status"], buckets=SEARCH_BUCKETS,
+)
+SEARCH_STAGE_SECONDS = Histogram(
+    "cook_search_stage_seconds",
+    "Thời gian từng stage của search: encode, index_lookup, chroma_query, rerank, response",
+    ["endpoint", "stage"], buckets=SEARCH_BUCKETS,
+)
+SYNC_PHASE_SECONDS = Histogram(
+    "cook_sync_phase_seconds",
+    "Thời gian từng phase của sync (theo chunk): mongo_load, diff, build_text, encode, upsert, delete, memory_index",
+    ["phase"], buckets=SYNC_BUCKETS,
+)
+SYNC_SECONDS = Histogram("cook_sync_seconds", "Tổng thời gian 1 lần sync", ["mode"], buckets=SYNC_BUCKETS)
+SYNC_RECIPES = Counter("cook_sync_recipes_total", "Số recipe được sync xử lý", ["action"])
+
+
+def search_stage(endpoint, stage):
+    """Context manager đo 1 stage của search"""
+    return SEARCH_STAGE_SECONDS.labels(endpoint, stage).time()
+
+
+def sync_phase(phase):
+    """Context manager đo 1 phase của sync"""
+    return SYNC_PHASE_SECONDS.labels(phase).time()
+
+
+def render_metrics():
+    """Metrics của process này, hoặc gộp mọi worker khi chạy multiprocess"""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=MULTIPROC_DIR)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,97 @@
+# services/pagination.py
+"""
+Cursor pagination: lần gọi đầu rank 1 pool ứng viên lớn (PAGINATION_POOL_SIZE) một lần,
+lưu danh sách hit đã sắp xếp vào snapshot có TTL; các trang sau chỉ cắt từ snapshot
+(không encode, không query Chroma, không re-rank) nên thứ tự giữa các trang nhất quán.
+
+Cursor tự mô tả (loại search, request đã bỏ cursor / page_size, generation của index, offset, page_size):
+với nhiều worker, trang sau rơi vào worker khác vẫn rank lại đúng pool của cùng generation rồi cache ở worker đó.
+"""
+import base64
+import binascii
+import json
+import zlib
+from fastapi import HTTPException
+from pydantic import ValidationError
+from config.settings import settings
+from data.cache import TTLCache, SearchResultCache
+
+
+def encode_cursor(kind, pool_req, generation, offset, page_size):
+    raw = json.dumps(
+        {
+            "kind": kind,
+            "request": pool_req.model_dump(exclude_defaults=True),
+            "generation": generation,
+            "offset": offset,
+            "pageSize": page_size,
+        },
+        ensure_ascii=False, separators=(",", ":"),
+    ).encode("utf-8")
+    return base64.urlsafe_b64encode(zlib.compress(raw)).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, kind, model):
+    """(request của pool, generation, offset, page_size); cursor không hợp lệ / của endpoint khác → 400"""
+    try:
+        raw = zlib.decompress(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        data = json.loads(raw)
+        if data["kind"] != kind:
+            raise ValueError(f"cursor belongs to {data['kind']!r}")
+        pool_req = pool_request(model(**data["request"]))
+        return pool_req, int(data["generation"]), int(data["offset"]), int(data["pageSize"])
+    except (binascii.Error, zlib.error, UnicodeDecodeError, ValidationError, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def pool_request(req):
+    """Request xác định pool: bỏ cursor / page_size (các trang của cùng 1 lần tìm dùng chung pool)"""
+    return req.model_copy(update={"cursor": None, "page_size": None})
+
+
+def clamp_page_size(page_size):
+    return max(1, min(page_size, settings.PAGINATION_MAX_PAGE_SIZE))
+
+
+class PageSnapshots:
+    """Snapshot {(loại, request, generation): (query, hits đã rank)} trong cache LRU + TTL của từng worker"""
+
+    def __init__(self, maxsize, ttl):
+        self._cache = TTLCache(maxsize, ttl)
+
+    def first_page(self, kind, req, generation, result):
+        """Lưu kết quả đã rank của pool, trả về trang đầu kèm next_cursor"""
+        return self.store(kind, pool_request(req), generation, result, 0, req.page_size)
+
+    def store(self, kind, pool_req, generation, result, offset, page_size):
+        """Lưu pool vừa rank (lần tìm đầu hoặc rank lại cho cursor do worker khác cấp), trả về trang tại offset"""
+        self._cache.set(SearchResultCache.request_key(kind, pool_req, generation), (result["query"], result["hits"]))
+        return self._page(kind, pool_req, generation, result["query"], result["hits"], offset, page_size)
+
+    def page(self, kind, pool_req, generation, offset, page_size):
+        """Trang tại offset từ snapshot của worker này, hoặc None nếu chưa có / đã hết TTL"""
+        snapshot = self._cache.get(SearchResultCache.request_key(kind, pool_req, generation))
+        if snapshot is None:
+            return None
+        query, hits = snapshot
+        return self._page(kind, pool_req, generation, query, hits, offset, page_size)
+
+    def stats(self):
+        return self._cache.stats()
+
+    @staticmethod
+    def _page(kind, pool_req, generation, query, hits, offset, page_size):
+        page_size = clamp_page_size(page_size)
+        end = offset + page_size
+        return {
+            "query": query,
+            "hits": hits[offset:end],
+            "total": len(hits),
+            "next_cursor": encode_cursor(kind, pool_req, generation, end, page_size) if end < len(hits) else None,
+        }
+
+
+page_snapshots = PageSnapshots(
+    maxsize=settings.PAGINATION_SNAPSHOT_CACHE_SIZE,
+    ttl=settings.PAGINATION_SNAPSHOT_TTL,
+)
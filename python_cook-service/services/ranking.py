@@ -0,0 +1,353 @@
+# services/ranking.py
+"""
+Engine re-rank dùng chung cho /search và search-by-keyword.
+Chấm điểm cả batch ứng viên một lần bằng mảng NumPy (distance, popularity,
+số từ / nguyên liệu khớp, mask ngưỡng) rồi lấy top-k bằng argpartition.
+"""
+import time
+import numpy as np
+from config.logger import get_logger, debug_sampled
+from data.db import collection, fetch_with_distances
+from data.keyword_index import keyword_index, make_doc, fold
+from data.popularity import popularity_store
+from data.recipe_store import recipe_store, RecipeRecord
+from services.metrics import SEARCH_STAGE_SECONDS, search_stage
+
+logger = get_logger("search")
+
+
+class Candidates:
+    """Batch ứng viên: id, RecipeRecord, distance tới query"""
+
+    def __init__(self, ids, records, distances):
+        # Bỏ các id không còn record (vừa bị xóa)
+        kept = [i for i, record in enumerate(records) if record is not None]
+        self.ids = [ids[i] for i in kept]
+        self.records = [records[i] for i in kept]
+        self.distances = [distances[i] for i in kept]
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def lookup_records(ids):
+    """Join id với recipe_store; id chưa có trong store (đang sync) thì đọc metadata từ Chroma"""
+    records = [recipe_store.get(rid) for rid in ids]
+    missing = [rid for rid, record in zip(ids, records) if record is None]
+    if missing:
+        data = collection.get(ids=missing, include=["metadatas"])
+        by_id = {m["id"]: RecipeRecord(m) for m in data["metadatas"]}
+        records = [record or by_id.get(rid) for rid, record in zip(ids, records)]
+    return records
+
+
+def query_neighbours(q_embs, where, n_results):
+    """
+    Vector neighbours từ Chroma cho nhiều query cùng where clause bằng 1 lần collection.query
+    (chỉ lấy id + distance). Trả về [(ids, distances)] theo thứ tự q_embs.
+    """
+    results = collection.query(
+        query_embeddings=list(q_embs),
+        n_results=n_results,
+        where=where,
+        include=["distances"]
+    )
+    if not results or not results.get("ids"):
+        return [([], []) for _ in q_embs]
+    return [(list(ids), list(distances)) for ids, distances in zip(results["ids"], results["distances"])]
+
+
+def collect_candidates(q_emb, where, n_results, extra_ids=(), neighbours=None):
+    """
+    Vector neighbours từ Chroma (đã lọc bằng where; batch search truyền sẵn `neighbours`)
+    + các ứng viên từ index in-memory nằm ngoài cửa sổ vector, join với recipe_store
+    """
+    if neighbours is None:
+        neighbours = query_neighbours([q_emb], where, n_results)[0]
+    ids, distances = list(neighbours[0][:n_results]), list(neighbours[1][:n_results])
+
+    seen_ids = set(ids)
+    extra, extra_distances = fetch_with_distances([rid for rid in extra_ids if rid not in seen_ids], q_emb, where)
+    ids += extra
+    distances += extra_distances
+    return Candidates(ids, lookup_records(ids), distances)
+
+
+def vector_scores(distances):
+    """Distance nhỏ → score cao"""
+    return np.where(distances >= 0, 1000 / (1 + np.maximum(distances, 0)), 0.0)
+
+
+def popularity_inputs(cands):
+    """(rate, numberOfRate) từ popularity store, fallback về giá trị lúc index"""
+    fallback_rates = np.array([r.rate for r in cands.records], dtype=np.float64)
+    fallback_nums = np.array([r.number_of_rate for r in cands.records], dtype=np.int64)
+    return popularity_store.lookup(cands.ids, fallback_rates, fallback_nums)
+
+
+def popularity_scores(rates, num_rates, weight):
+    return (rates / 5.0) * np.log1p(num_rates) * weight
+
+
+def top_k_indices(scores, mask, k):
+    """Chỉ số các ứng viên hợp lệ có score cao nhất, giảm dần (partial sort)"""
+    idx = np.flatnonzero(mask)
+    if len(idx) > k:
+        idx = idx[np.argpartition(-scores[idx], k - 1)[:k]]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def rank_suggestions(matches, limit):
+    """
+    Scoring /search/suggest (chỉ dùng dữ liệu in-memory, không encode / không query Chroma):
+    khớp ngay đầu tên trước, sau đó theo popularity, tên ngắn hơn trước
+    """
+    records = [record for record in map(recipe_store.get, matches) if record is not None]
+    if not records:
+        return []
+    ids = [r.id for r in records]
+    rates, num_rates = popularity_store.lookup(
+        ids,
+        np.array([r.rate for r in records], dtype=np.float64),
+        np.array([r.number_of_rate for r in records], dtype=np.int64),
+    )
+    at_name_start = np.array([matches[rid] == 0 for rid in ids])
+    name_lens = np.array([len(r.name) for r in records])
+    order = np.lexsort((name_lens, -popularity_scores(rates, num_rates, 1.0), ~at_name_start))[:limit]
+    return [
+        {
+            "id": records[i].id,
+            "name": records[i].name,
+            "image": records[i].image,
+            "rate": float(rates[i]),
+            "numberOfRate": int(num_rates[i]),
+        }
+        for i in order
+    ]
+
+
+# Các trường của 1 hit; client chọn bớt bằng `fields` (id luôn được trả về)
+HIT_FIELDS = (
+    "id", "name", "short", "image", "calories", "time", "size", "difficulty", "cuisine", "category",
+    "rate", "numberOfRate", "ingredients", "distance", "relevance_score", "match_ratio",
+)
+
+
+def project_hit(hit, fields):
+    """Chỉ giữ các trường được chọn (fields=None: trả về đầy đủ)"""
+    if fields is None:
+        return hit
+    return {name: hit[name] for name in fields if name in hit}
+
+
+def build_hit(record, rate, num_rates, distance, relevance_score):
+    return {
+        "id": record.id,
+        "name": record.name,
+        "short": record.short,
+        "image": record.image,
+        "calories": record.calories,
+        "time": record.time,
+        "size": record.size,
+        "difficulty": record.difficulty,
+        "cuisine": record.cuisine,
+        "category": record.category,
+        "rate": float(rate),
+        "numberOfRate": int(num_rates),
+        "ingredients": list(record.ingredients),
+        "distance": float(distance),
+        "relevance_score": float(relevance_score),
+    }
+
+
+def rank_ingredient_hits(cands, user_ings, ing_match, top_k, fields=None):
+    """
+    Scoring /search:
+    - Ưu tiên món có nhiều nguyên liệu khớp (match_ratio / coverage / jaccard)
+    - Kết hợp với vector similarity và popularity
+    """
+    if not len(cands):
+        return []
+    start = time.perf_counter()
+    distances = np.asarray(cands.distances, dtype=np.float64)
+
+    # 1. Ingredient matching score (ưu tiên trùng nguyên liệu cao hơn vector)
+    if user_ings:
+        # Ngưỡng match_ratio >= 0.5 và độ phủ (món nhiều nguyên liệu cần trùng nhiều hơn)
+        # đã được áp trong ingredient_index.match
+        common, n_hit_ings, mask = ing_match.lookup(cands.ids)
+        n_user = len(user_ings)
+        match_ratio = common / n_user
+        coverage_ratio = common / n_hit_ings
+        jaccard = common / np.maximum(n_hit_ings + n_user - common, 1)
+        ingredient_signal = match_ratio * 0.55 + coverage_ratio * 0.35 + jaccard * 0.10
+        ingredient_score = ingredient_signal * 1500
+    else:
+        # Không có nguyên liệu filter
+        mask = np.ones(len(cands), dtype=bool)
+        match_ratio = np.ones(len(cands))
+        ingredient_score = np.full(len(cands), 500.0)
+
+    # 2. Vector similarity
+    vector_score = vector_scores(distances)
+
+    # 3. Popularity score
+    rates, num_rates = popularity_inputs(cands)
+    popularity_score = popularity_scores(rates, num_rates, 100)
+
+    # === TỔNG HỢP ===
+    relevance_score = (
+        ingredient_score * 3.0 +    # Ưu tiên nguyên liệu khớp mạnh hơn
+        vector_score * 0.3 +        # Vector chỉ hỗ trợ
+        popularity_score * 0.4      # Popularity
+    )
+    top = top_k_indices(relevance_score, mask, top_k)
+    SEARCH_STAGE_SECONDS.labels("search", "rerank").observe(time.perf_counter() - start)
+
+    hits = []
+    with search_stage("search", "response"):
+        for i in top:
+            hit = build_hit(cands.records[i], rates[i], num_rates[i], distances[i], relevance_score[i])
+            hit["match_ratio"] = float(match_ratio[i])
+            hits.append(project_hit(hit, fields))
+    return hits
+
+
+def rank_keyword_hits(cands, keywords, keyword_list, bm25_scores, top_k, fields=None, debug=False, expansions=None):
+    """
+    Scoring search-by-keyword (giống Google/YouTube):
+    1. Exact match (khớp chính xác) - điểm cao nhất
+    2. Phrase match (chuỗi từ liên tiếp) - điểm cao
+    3. All words match (tất cả từ có mặt) - điểm trung bình
+    4. Partial match (một số từ) - điểm thấp
+    5. Position boost, vector similarity, popularity
+    Từ gõ sai được khớp gần đúng qua `expansions` (trigram index): {từ trong tên: similarity} cho mỗi từ khóa
+    debug=True: kèm `_debug` (điểm từng thành phần) trong mỗi hit
+    """
+    n = len(cands)
+    if not n:
+        return []
+    start = time.perf_counter()
+    n_kw = len(keyword_list)
+    keywords_lower = keywords.lower()
+    keywords_no_accent = fold(keywords)
+    distances = np.asarray(cands.distances, dtype=np.float64)
+
+    # Các text field đã tokenize sẵn trong index (fallback: tokenize từ record)
+    docs = [keyword_index.get(rid) or make_doc(record) for rid, record in zip(cands.ids, cands.records)]
+    names_lower = [record.name_lower for record in cands.records]
+
+    def flags(values):
+        return np.fromiter(values, dtype=bool, count=n)
+
+    # 1. EXACT MATCH - Khớp chính xác toàn bộ query (score cao nhất)
+    # Substring exact match chỉ tính khi là WORD BOUNDARY (thêm space 2 đầu),
+    # ví dụ: "bún chả" trong "bún chả hà nội" ✅
+    multi = n_kw >= 2
+    exact_match_score = np.select(
+        [
+            flags(keywords_no_accent == d.name_no_accent for d in docs),
+            flags(keywords_lower == nl for nl in names_lower),
+            flags(multi and f" {keywords_no_accent} " in f" {d.name_no_accent} " for d in docs),
+            flags(multi and f" {keywords_lower} " in f" {nl} " for nl in names_lower),
+        ],
+        [1000, 900, 800, 700],
+        0,
+    )
+
+    # 2. PHRASE MATCH - Chuỗi từ liên tiếp xuất hiện
+    if multi:
+        query_phrase = " ".join(keyword_list)
+        phrase_match_score = np.select(
+            [flags(query_phrase in d.name_no_accent for d in docs),
+             flags(query_phrase in d.short_no_accent for d in docs)],
+            [500, 300],
+            0,
+        )
+    else:
+        phrase_match_score = np.zeros(n, dtype=np.int64)
+
+    # 3. ALL WORDS MATCH - Chỉ match CHÍNH XÁC từ, không phải substring
+    # Ví dụ: "ga" match với "ga" nhưng KHÔNG match với "nga"
+    matched_in_name = sum(flags(kw in d.name_words for d in docs).astype(np.int64) for kw in keyword_list)
+    matched_in_short = sum(flags(kw in d.short_words for d in docs).astype(np.int64) for kw in keyword_list)
+    all_words_match_score = np.select([matched_in_name == n_kw, matched_in_short == n_kw], [400, 100], 0)
+
+    # 4. PARTIAL MATCH - Một số từ khớp (name quan trọng hơn short)
+    partial_match_score = np.where(
+        matched_in_name > 0, matched_in_name / n_kw * 300,
+        np.where(matched_in_short > 0, matched_in_short / n_kw * 150, 0.0),
+    )
+
+    # 4b. FUZZY MATCH - Từ khóa gõ sai ("bunn") khớp gần đúng với từ trong NAME ("bun"),
+    # cộng similarity tốt nhất của từng từ khóa (từ gõ đúng đã tính ở trên, expansion rỗng)
+    fuzzy_in_name = np.zeros(n)
+    for similar in expansions or ():
+        if similar:
+            fuzzy_in_name += np.fromiter(
+                (max((similar.get(w, 0.0) for w in d.name_words), default=0.0) for d in docs),
+                dtype=np.float64, count=n,
+            )
+    fuzzy_match_score = fuzzy_in_name / n_kw * 250
+
+    # 5. POSITION BOOST - Từ xuất hiện ở đầu tên món được ưu tiên
+    position_score = flags(d.name_first_word == keyword_list[0] for d in docs) * 100
+
+    # === THRESHOLD === Ưu tiên NAME hơn SHORT
+    if n_kw == 1:
+        # Query 1 từ (như "phở", "gà") - BẮT BUỘC match trong NAME (chính xác hoặc gần đúng)
+        mask = (matched_in_name > 0) | (fuzzy_in_name > 0)
+    else:
+        # Query 2+ từ: OK nếu có exact/phrase, hoặc match >= 50% trong NAME,
+        # hoặc match 100% trong SHORT (khi không match gì trong NAME)
+        has_strong_match = (exact_match_score > 0) | (phrase_match_score > 0)
+        name_pct = (matched_in_name + fuzzy_in_name) / n_kw
+        short_pct = matched_in_short / n_kw
+        insufficient = (name_pct < 0.5) & (short_pct < 1.0)
+        short_only_partial = (matched_in_name == 0) & (fuzzy_in_name == 0) & (short_pct < 1.0)
+        mask = has_strong_match | ~(insufficient | short_only_partial)
+
+    # 6. VECTOR SIMILARITY + 7. POPULARITY
+    vector_score = vector_scores(distances)
+    rates, num_rates = popularity_inputs(cands)
+    popularity_score = popularity_scores(rates, num_rates, 50)
+
+    # === TỔNG HỢP ĐIỂM ===
+    relevance_score = (
+        exact_match_score * 5.0 +      # Ưu tiên cao nhất
+        phrase_match_score * 3.0 +     # Ưu tiên cao
+        all_words_match_score * 2.0 +  # Ưu tiên trung bình
+        partial_match_score * 1.0 +    # Ưu tiên thấp
+        fuzzy_match_score * 1.0 +      # Khớp gần đúng (gõ sai)
+        position_score * 1.5 +         # Boost cho từ đầu tiên
+        vector_score * 1.0 +           # Semantic similarity
+        popularity_score * 0.5         # Popularity (chỉ boost thêm)
+    )
+    mask &= relevance_score > 0
+
+    debug_sampled(logger, "[Search] Re-rank: %d candidates, %d matched, %d skipped", n, int(mask.sum()), n - int(mask.sum()))
+    top = top_k_indices(relevance_score, mask, top_k)
+    SEARCH_STAGE_SECONDS.labels("keyword", "rerank").observe(time.perf_counter() - start)
+
+    hits = []
+    with search_stage("keyword", "response"):
+        for i in top:
+            hit = project_hit(
+                build_hit(cands.records[i], rates[i], num_rates[i], distances[i], relevance_score[i]), fields
+            )
+            if not debug:
+                hits.append(hit)
+                continue
+            hit["_debug"] = {
+                "exact": int(exact_match_score[i]),
+                "phrase": int(phrase_match_score[i]),
+                "all_words": int(all_words_match_score[i]),
+                "partial": float(partial_match_score[i]),
+                "fuzzy": round(float(fuzzy_match_score[i]), 2),
+                "position": int(position_score[i]),
+                "vector": round(float(vector_score[i]), 2),
+                "popularity": round(float(popularity_score[i]), 2),
+                "bm25": round(bm25_scores.get(cands.ids[i], 0.0), 2),
+            }
+            hits.append(hit)
+    return hits
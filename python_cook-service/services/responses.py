@@ -0,0 +1,13 @@
+# services/responses.py
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response serialize bằng orjson (nhanh hơn json.dumps nhiều lần, hiểu luôn kiểu NumPy).
+    Route search trả thẳng instance này để bỏ qua cả bước jsonable_encoder của FastAPI.
+    """
+
+    def render(self, content):
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
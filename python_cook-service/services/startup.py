@@ -0,0 +1,169 @@
+# services/startup.py
+"""
+Startup chạy nền: app nhận request (/ping) ngay, còn load model, warmup,
+load index in-memory, sync lần đầu và scheduler được chạy trong 1 thread riêng.
+
+Chạy nhiều worker: chỉ process giữ được leader lock mới sync / ghi Chroma;
+các worker follower poll generation trên đĩa và reload index khi leader ghi dữ liệu mới.
+"""
+import threading
+import time
+from apscheduler.schedulers.background import BackgroundScheduler
+from config.settings import settings
+from config.logger import get_logger
+from data.db import collection, get_embed_model, EMBED_MODEL_KEY
+from data.indexing import (
+    sync_recipes_to_chroma, rebuild_memory_indexes, reload_indexes, index_generation,
+)
+from data.leader import leader_lock, pop_reindex_request
+from data.popularity import popularity_store
+from data.recipe_store import recipe_store
+from data.snapshot import import_snapshot, export_snapshot
+from data.sync_state import load_generation
+
+logger = get_logger("startup")
+
+WARMUP_TEXTS = ["Nguyên liệu: thịt bò, hành", "phở bò. Món ăn: phở bò. Tìm kiếm: phở bò"]
+
+scheduler = BackgroundScheduler()
+
+
+class Readiness:
+    """Trạng thái startup: alive (/ping) ≠ ready (model đã warmup + index đã load)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.role = None
+        self.model_warmed = False
+        self.index_loaded = False
+        self.synced = False
+        self.error = None
+        self.started_at = time.time()
+        self.ready_at = None
+
+    @property
+    def ready(self):
+        return self.model_warmed and self.index_loaded
+
+    def mark(self, **flags):
+        with self._lock:
+            for name, value in flags.items():
+                setattr(self, name, value)
+            if self.ready and self.ready_at is None:
+                self.ready_at = time.time()
+
+    def status(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "role": self.role,
+                "model": EMBED_MODEL_KEY,
+                "model_warmed": self.model_warmed,
+                "index_loaded": self.index_loaded,
+                "synced": self.synced,
+                "generation": index_generation(),
+                "recipes": len(recipe_store),
+                "startup_seconds": round((self.ready_at or time.time()) - self.started_at, 2),
+                "error": self.error,
+            }
+
+
+readiness = Readiness()
+
+
+def is_leader():
+    return not settings.SYNC_LEADER_LOCK or leader_lock.is_leader
+
+
+def warm_up_model():
+    """Load model + encode thử vài query (khởi tạo graph / allocator trước request đầu tiên)"""
+    start = time.time()
+    get_embed_model().encode(WARMUP_TEXTS, batch_size=len(WARMUP_TEXTS), show_progress_bar=False)
+    readiness.mark(model_warmed=True)
+    logger.info("[Startup] 🔥 Model %s warmed up (%.2fs)", EMBED_MODEL_KEY, time.time() - start)
+
+
+def restore_snapshot():
+    """Replica mới (Chroma trống): nạp snapshot mới nhất từ SNAPSHOT_DIR, sau đó chỉ cần sync delta"""
+    if settings.SNAPSHOT_DIR and collection.count() == 0:
+        import_snapshot()
+
+
+def load_indexes():
+    """Chroma đã có dữ liệu (volume cũ): build index in-memory từ đó, phục vụ ngay rồi mới sync delta"""
+    if collection.count() > 0:
+        rebuild_memory_indexes()
+        readiness.mark(index_loaded=True)
+
+
+def sync_job(full=False):
+    # Worker follower nhận /reindex → leader chạy full sync thay
+    full = pop_reindex_request() or full
+    sync_recipes_to_chroma(full=full)
+    readiness.mark(index_loaded=True, synced=True, error=None)
+
+
+def follow_job():
+    """Worker follower: leader đã ghi dữ liệu mới (generation tăng) → reload; leader chết → lên thay"""
+    if leader_lock.try_acquire():
+        logger.info("[Startup] 👑 Leader lock acquired, taking over syncing.")
+        readiness.mark(role="leader")
+        scheduler.remove_job("follow")
+        add_sync_jobs()
+        return
+    generation = load_generation()
+    if generation != index_generation():
+        reload_indexes(generation)
+        readiness.mark(index_loaded=True, synced=True)
+
+
+def add_sync_jobs():
+    # Delta sync theo watermark updatedAt (rẻ, chạy thường xuyên)
+    # + full reconcile định kỳ làm fallback
+    scheduler.add_job(sync_job, 'interval', seconds=settings.SYNC_INTERVAL_SECONDS, id="sync")
+    scheduler.add_job(sync_job, 'interval', hours=settings.FULL_SYNC_INTERVAL_HOURS, kwargs={"full": True}, id="full_sync")
+    # Export snapshot định kỳ cho các replica mới
+    if settings.SNAPSHOT_DIR and settings.SNAPSHOT_EXPORT_HOURS > 0:
+        scheduler.add_job(export_snapshot, 'interval', hours=settings.SNAPSHOT_EXPORT_HOURS, id="snapshot_export")
+
+
+def run_startup():
+    if settings.SYNC_LEADER_LOCK:
+        leader_lock.try_acquire()
+    readiness.mark(role="leader" if is_leader() else "follower")
+    logger.info("[Startup] Role: %s", readiness.role)
+    try:
+        warm_up_model()
+        # Chỉ leader ghi Chroma: follower đợi leader nạp snapshot / sync rồi reload
+        if is_leader():
+            restore_snapshot()
+        load_indexes()
+        popularity_store.refresh()
+
+        # Lần đầu chạy (follower chờ leader sync rồi reload qua follow_job)
+        if is_leader():
+            sync_job()
+        logger.info("[Startup] ✅ Started (%d recipes)", len(recipe_store))
+    except Exception as e:
+        readiness.mark(error=str(e))
+        logger.error("[Startup] ❌ Error: %s", e)
+    finally:
+        # Sync lần đầu lỗi (Mongo chưa sẵn sàng, ...) thì scheduler sẽ thử lại
+        if is_leader():
+            add_sync_jobs()
+        else:
+            scheduler.add_job(follow_job, 'interval', seconds=settings.FOLLOWER_POLL_SECONDS, id="follow")
+        scheduler.add_job(popularity_store.refresh, 'interval', seconds=settings.POPULARITY_REFRESH_SECONDS)
+        scheduler.start()
+
+
+def start_background_startup():
+    thread = threading.Thread(target=run_startup, name="startup", daemon=True)
+    thread.start()
+    return thread
+
+
+def shutdown():
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    leader_lock.release()
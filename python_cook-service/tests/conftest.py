@@ -0,0 +1,9 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+# Settings đọc từ env lúc import: Chroma / manifest ghi vào thư mục tạm, MongoClient kết nối lười (không cần Mongo thật)
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ["CHROMA_PATH"] = tempfile.mkdtemp(prefix="cook-test-chroma-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
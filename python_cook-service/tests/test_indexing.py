@@ -0,0 +1,109 @@
+# tests/test_indexing.py
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from data.db import collection
+from data.indexing import generate_text_and_meta, write_chunk, remove_from_memory_indexes, tag_key
+from data.manifest import manifest
+from data.recipe_store import recipe_store
+
+RID = "test-recipe-1"
+
+
+def lookup_cache(tags):
+    return {"ingredients": {}, "tags": tags, "cuisines": {}, "categories": {}}
+
+
+def index_recipe(tag_ids, cache):
+    text, meta = generate_text_and_meta({"id": RID, "name": "Phở bò", "tags": tag_ids}, cache)
+    write_chunk([RID], [text], [meta], np.ones((1, 4), dtype=np.float32), ["hash"], {}, [])
+
+
+def tagged(tag_name):
+    return collection.get(where={tag_key(tag_name): True})["ids"]
+
+
+@pytest.fixture(autouse=True)
+def cleanup():
+    yield
+    collection.delete(ids=[RID])
+    manifest.delete([RID])
+    remove_from_memory_indexes([RID])
+    manifest.save_lookups({})
+
+
+def test_renamed_tag_no_longer_matches_filter():
+    index_recipe(["t1"], lookup_cache({"t1": "Healthy"}))
+    assert tagged("healthy") == [RID]
+
+    index_recipe(["t1"], lookup_cache({"t1": "Eat clean"}))
+    assert tagged("healthy") == []
+    assert tagged("eat clean") == [RID]
+
+
+def test_removed_tag_no_longer_matches_filter():
+    cache = lookup_cache({"t1": "Healthy", "t2": "Ăn sáng"})
+    index_recipe(["t1", "t2"], cache)
+    index_recipe(["t2"], cache)
+    assert tagged("healthy") == []
+    assert tagged("ăn sáng") == [RID]
+
+
+def test_stale_tag_cleared_when_recipe_missing_from_store():
+    index_recipe(["t1"], lookup_cache({"t1": "Healthy"}))
+    recipe_store.remove([RID])  # tag cũ chỉ còn trong metadata Chroma
+
+    index_recipe([], lookup_cache({"t1": "Healthy"}))
+    assert tagged("healthy") == []
+
+
+class FakeEncoder:
+    def encode(self, texts, **kwargs):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def test_lookup_rename_reindexes_dependents_and_drops_old_tag(monkeypatch):
+    import data.indexing as indexing
+
+    recipe = {"name": "Phở bò", "tags": ["t1"], "updatedAt": "2025-01-01"}
+    monkeypatch.setattr(indexing, "iter_recipe_batches", lambda query, batch_size: iter([[{**recipe, "id": RID}]]))
+    monkeypatch.setattr(indexing, "get_embed_model", lambda: FakeEncoder())
+    manifest.save_lookups({})
+
+    old_cache = lookup_cache({"t1": "Healthy"})
+    indexing.run_index_pipeline({}, old_cache)
+    indexing.reindex_lookup_dependents(old_cache)  # lần đầu: chỉ lưu tên lookup
+    assert tagged("healthy") == [RID]
+
+    new_cache = lookup_cache({"t1": "Eat clean"})
+    assert indexing.reindex_lookup_dependents(new_cache) == 1
+    assert tagged("healthy") == []
+    assert tagged("eat clean") == [RID]
+    assert recipe_store.get(RID).tags == {"eat clean"}
+    assert indexing.reindex_lookup_dependents(new_cache) == 0
+
+
+def test_delta_sync_picks_up_late_commit_before_watermark(monkeypatch):
+    import data.indexing as indexing
+
+    watermark = datetime(2026, 1, 1, 12, 0, 0)
+    docs = [{"id": RID, "name": "Phở bò", "updatedAt": watermark - timedelta(hours=1)}]
+
+    def find(query, batch_size):
+        since = query.get("updatedAt", {}).get("$gte", datetime.min)
+        return iter([[dict(d) for d in docs if d["updatedAt"] >= since]])
+
+    monkeypatch.setattr(indexing, "iter_recipe_batches", find)
+    monkeypatch.setattr(indexing, "load_recipe_ids", lambda: {RID})
+    monkeypatch.setattr(indexing, "get_embed_model", lambda: FakeEncoder())
+    cache = lookup_cache({})
+    indexing.run_index_pipeline({}, cache)
+
+    # Ghi có updatedAt trước watermark nhưng commit sau lần sync trước
+    docs[0] = {"id": RID, "name": "Bún chả", "updatedAt": watermark - timedelta(milliseconds=5)}
+    indexed, deleted, new_watermark = indexing.delta_sync(cache, watermark)
+    assert (indexed, deleted, new_watermark) == (1, 0, watermark)
+    assert recipe_store.get(RID).name == "Bún chả"
+
+    # Đọc lại trong cửa sổ lag nhưng không đổi → manifest bỏ qua
+    assert indexing.delta_sync(cache, watermark)[0] == 0
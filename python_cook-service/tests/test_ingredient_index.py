@@ -0,0 +1,21 @@
+# tests/test_ingredient_index.py
+from data.ingredient_index import IngredientIndex
+from data.recipe_store import RecipeRecord
+
+
+def record(rid, ingredients):
+    return RecipeRecord({"id": rid, "name": rid, "ingredients": ", ".join(ingredients)})
+
+
+def test_match_is_not_affected_by_later_removal():
+    index = IngredientIndex()
+    index.rebuild([record("a", ["gà", "hành"]), record("b", ["gà", "tỏi"])])
+    match = index.match({"gà", "hành"})
+    expected = match.top_ids(10)
+
+    index.remove(["a"])  # sync xóa recipe sau khi match đã trả về
+    index.upsert([record("c", ["bún"])])  # ... và cấp lại slot của "a"
+    assert expected == ["a", "b"]
+    assert match.top_ids(10) == expected
+    common, _, _ = match.lookup(["a", "b"])
+    assert list(common) == [2, 1]
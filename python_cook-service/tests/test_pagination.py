@@ -0,0 +1,31 @@
+# tests/test_pagination.py
+import pytest
+from fastapi import HTTPException
+from models.models import SearchRequest, KeywordSearchRequest
+from services.pagination import PageSnapshots, decode_cursor
+
+
+def test_cursor_is_self_describing_across_workers():
+    result = {"query": "q", "hits": [{"id": str(i)} for i in range(10)]}
+    req = SearchRequest(ingredients=["Gà", "hành"], page_size=4, fields=["name"])
+    first = PageSnapshots(10, 60).first_page("search", req, 7, result)
+    assert [h["id"] for h in first["hits"]] == ["0", "1", "2", "3"]
+
+    # Worker khác: chưa có snapshot → đọc lại request / generation từ cursor, rank lại rồi lưu
+    other = PageSnapshots(10, 60)
+    pool_req, generation, offset, page_size = decode_cursor(first["next_cursor"], "search", SearchRequest)
+    assert (pool_req.ingredients, pool_req.fields, pool_req.page_size, generation, offset, page_size) == (
+        ["Gà", "hành"], ["name"], None, 7, 4, 4,
+    )
+    assert other.page("search", pool_req, generation, offset, page_size) is None
+    second = other.store("search", pool_req, generation, result, offset, page_size)
+    assert [h["id"] for h in second["hits"]] == ["4", "5", "6", "7"]
+    assert other.page("search", pool_req, generation, offset, page_size) == second
+
+
+def test_cursor_of_other_endpoint_is_rejected():
+    req = KeywordSearchRequest(keywords="phở", page_size=2)
+    page = PageSnapshots(10, 60).first_page("keyword", req, 1, {"query": "phở", "hits": [{"id": "a"}] * 3})
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(page["next_cursor"], "search", SearchRequest)
+    assert e.value.status_code == 400
@@ -0,0 +1,20 @@
+# tests/test_popularity.py
+import data.popularity as popularity
+from data.popularity import PopularityStore
+
+
+def test_refresh_reports_changes_and_bumps_version(monkeypatch):
+    docs = [{"_id": "a", "rate": 4.0, "numberOfRate": 10}, {"_id": "b", "rate": 3.0, "numberOfRate": 2}]
+    monkeypatch.setattr(popularity.mongo_collection, "find", lambda *args, **kwargs: [dict(d) for d in docs])
+    store = PopularityStore()
+
+    assert store.refresh() is True
+    version = store.version
+    docs.reverse()  # cùng dữ liệu, khác thứ tự
+    assert store.refresh() is False and store.version == version
+
+    docs[0]["numberOfRate"] += 1
+    assert store.refresh() is True and store.version == version + 1
+
+    store.update("a", 5.0, 11)
+    assert store.version == version + 2
@@ -0,0 +1,47 @@
+# tests/test_suggest.py
+from data.recipe_store import recipe_store
+from data.suggest_index import SuggestIndex, SUGGEST_MAX_CANDIDATES
+from services.ranking import rank_suggestions
+
+
+def test_popular_name_start_match_beyond_alphabetical_window():
+    metas = [{"id": f"r{i}", "name": f"Bánh {i:05d}", "numberOfRate": 0} for i in range(3000)]
+    metas.append({"id": "star", "name": "Bún bò Huế", "rate": 5.0, "numberOfRate": 10 ** 6})
+    records = recipe_store.upsert(metas)
+    try:
+        index = SuggestIndex()
+        index.rebuild(records)
+        matches = index.lookup("b")
+        assert matches["star"] == 0
+        assert rank_suggestions(matches, 5)[0]["id"] == "star"
+    finally:
+        recipe_store.remove([m["id"] for m in metas])
+
+
+def test_buckets_follow_upsert_and_remove():
+    metas = [{"id": f"c{i}", "name": f"Canh {i:05d}", "rate": 3.0, "numberOfRate": i} for i in range(600)]
+    records = recipe_store.upsert(metas)
+    try:
+        index = SuggestIndex()
+        index.rebuild(records)
+        assert len(index.lookup("canh")) == SUGGEST_MAX_CANDIDATES
+
+        # Món mới phổ biến nhất vào bucket của prefix ngắn, món cũ đổi tên rời khỏi bucket
+        index.upsert(recipe_store.upsert([
+            {"id": "hot", "name": "Canh chua cá lóc", "rate": 5.0, "numberOfRate": 10 ** 6},
+            {"id": "c599", "name": "Lẩu thái", "rate": 3.0, "numberOfRate": 599},
+        ]))
+        assert rank_suggestions(index.lookup("c"), 1)[0]["id"] == "hot"
+        assert "c599" not in index.lookup("canh")
+        assert rank_suggestions(index.lookup("canh 005"), 1)[0]["id"] == "c598"
+
+        # Xóa bớt đến khi bucket phải tính lại / prefix đủ nhỏ để duyệt trực tiếp
+        removed = ["hot"] + [f"c{i}" for i in range(200, 599)]
+        recipe_store.remove(removed)
+        index.remove(removed)
+        matches = index.lookup("canh")
+        assert "hot" not in matches and len(matches) == SUGGEST_MAX_CANDIDATES
+        assert rank_suggestions(matches, 1)[0]["id"] == "c199"
+        assert set(index.lookup("canh 001")) == {f"c{i}" for i in range(100, 200)}
+    finally:
+        recipe_store.remove([m["id"] for m in metas] + ["hot"])
@@ -0,0 +1,30 @@
+# tests/test_sync_state.py
+from data.sync_state import save_generation, load_changes, load_sync_state, save_sync_state
+
+
+def setup_function():
+    save_sync_state({})
+
+
+def test_changes_merged_in_generation_order():
+    save_generation(1, {"a", "b"}, set())
+    save_generation(2, {"c"}, {"a"})
+    save_generation(3, {"a"}, {"c"})
+    assert load_changes(0, 3) == ({"a", "b"}, {"c"})
+    assert load_changes(1, 2) == ({"c"}, {"a"})
+    assert load_sync_state()["generation"] == 3
+
+
+def test_missing_or_oversized_generation_forces_rebuild(monkeypatch):
+    from config.settings import settings
+
+    save_generation(1, {"a"}, set())
+    save_generation(2, None)  # nạp snapshot: không có danh sách id
+    save_generation(3, {"b"}, set())
+    assert load_changes(0, 3) is None
+    assert load_changes(2, 3) == ({"b"}, set())
+
+    monkeypatch.setattr(settings, "FOLLOWER_PATCH_MAX_IDS", 1)
+    save_generation(4, {"c", "d"}, set())
+    assert load_changes(3, 4) is None
+    assert load_changes(3, 3) is None